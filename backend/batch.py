@@ -0,0 +1,504 @@
+"""Batch inference jobs: bulk prompt submission with bounded fan-out.
+
+A job and all of its items are written in one transaction at submission.
+The runner then checks the backend once per job, generates items with a
+per-backend concurrency limit shared by every job, and writes finished
+results back in batches. Progress lives in the database, so jobs that were
+queued or running when the process stopped are resumed on the next start.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Any, List, Optional, Set, Tuple
+from sqlalchemy import select, update, insert, bindparam, cast, String
+from sqlalchemy.orm import Session
+from config import settings
+from conversation_service import ConversationService
+from database import SessionLocal
+from fast_json import dumps, text_timestamp
+from ids import new_id
+from llm_connector import llm_connector
+from models import BatchJob, BatchItem, Conversation, Message
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Pending items loaded per query while dispatching
+DISPATCH_PAGE_SIZE = 200
+
+# Result rows read per query while streaming
+RESULT_PAGE_SIZE = 500
+
+# Seconds between backend health checks while a job waits for its backend
+BACKEND_RETRY_SECONDS = 15
+
+# Upper bound on how long a result stream sleeps without checking the database
+STREAM_POLL_SECONDS = 5.0
+
+
+class BatchService:
+    """Database operations for batch jobs and their items."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_job(
+        self,
+        items: List[Dict[str, Any]],
+        provider: str,
+        model: Optional[str] = None,
+        save_conversations: bool = False
+    ) -> BatchJob:
+        """Create a job and its items ({prompt, conversation_id}) in one transaction."""
+        conversation_ids = {item["conversation_id"] for item in items if item.get("conversation_id")}
+        if conversation_ids:
+            found = set(self.db.execute(
+                select(Conversation.id).where(Conversation.id.in_(conversation_ids))
+            ).scalars())
+            missing = conversation_ids - found
+            if missing:
+                raise ValueError(f"Unknown conversations: {', '.join(sorted(missing))}")
+
+        now = datetime.utcnow()
+        job = BatchJob(
+            id=new_id(),
+            status="queued",
+            provider=provider,
+            model=model,
+            save_conversations=save_conversations,
+            total_items=len(items),
+            completed_items=0,
+            failed_items=0,
+            created_at=now,
+            updated_at=now
+        )
+        self.db.add(job)
+        self.db.flush()
+
+        self.db.execute(insert(BatchItem.__table__), [
+            {
+                "id": new_id(),
+                "job_id": job.id,
+                "position": position,
+                "prompt": item["prompt"],
+                "conversation_id": item.get("conversation_id"),
+                "status": "pending",
+            }
+            for position, item in enumerate(items)
+        ])
+        self.db.commit()
+        self.db.refresh(job)
+
+        return job
+
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        """Get a batch job by ID."""
+        return self.db.query(BatchJob).filter(BatchJob.id == job_id).first()
+
+    def active_job_ids(self) -> List[str]:
+        """IDs of jobs that were queued or running, oldest first."""
+        return list(self.db.execute(
+            select(BatchJob.id).where(BatchJob.status.in_(ACTIVE_STATUSES)).order_by(BatchJob.id)
+        ).scalars())
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        """Update a job's status, stamping finished_at for terminal states."""
+        now = datetime.utcnow()
+        values = {"status": status, "error": error, "updated_at": now}
+        if status not in ACTIVE_STATUSES:
+            values["finished_at"] = now
+
+        self.db.execute(update(BatchJob.__table__).where(BatchJob.__table__.c.id == job_id).values(**values))
+        self.db.commit()
+
+    def pending_items(self, job_id: str, after_id: str, limit: int) -> List[Tuple[str, str, Optional[str]]]:
+        """Page through pending (id, prompt, conversation_id) rows in submission order."""
+        items = BatchItem.__table__
+        return [tuple(row) for row in self.db.execute(
+            select(items.c.id, items.c.prompt, items.c.conversation_id)
+            .where(items.c.job_id == job_id, items.c.status == "pending", items.c.id > after_id)
+            .order_by(items.c.id)
+            .limit(limit)
+        )]
+
+    def conversation_history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """History used as context for items that continue a conversation."""
+        return ConversationService(self.db).get_conversation_history(conversation_id)
+
+    def record_results(self, job_id: str, results: List[Dict[str, Any]], save_conversations: bool):
+        """Persist a batch of finished items (and their conversations) in one transaction."""
+        if not results:
+            return
+
+        now = datetime.utcnow()
+        job = self.db.query(BatchJob).filter(BatchJob.id == job_id).first()
+        seq = job.completed_items + job.failed_items
+
+        saved = [result for result in results if result["status"] == "done"] if save_conversations else []
+        if saved:
+            self._save_conversations(saved, now)
+
+        rows = []
+        for result in results:
+            seq += 1
+            rows.append({
+                "_id": result["id"],
+                "status": result["status"],
+                "response": result.get("response"),
+                "error": result.get("error"),
+                "conversation_id": result.get("conversation_id"),
+                "result_seq": seq,
+                "completed_at": now,
+            })
+
+        items = BatchItem.__table__
+        self.db.execute(
+            update(items).where(items.c.id == bindparam("_id")).values(
+                status=bindparam("status"),
+                response=bindparam("response"),
+                error=bindparam("error"),
+                conversation_id=bindparam("conversation_id"),
+                result_seq=bindparam("result_seq"),
+                completed_at=bindparam("completed_at")
+            ),
+            rows
+        )
+
+        done = sum(1 for result in results if result["status"] == "done")
+        job.completed_items = BatchJob.completed_items + done
+        job.failed_items = BatchJob.failed_items + (len(results) - done)
+        job.updated_at = now
+
+        if saved:
+            # Stats are refreshed set-based rather than per message
+            ConversationService(self.db).recompute_stats(list({result["conversation_id"] for result in saved}))
+        self.db.commit()
+
+    def _save_conversations(self, results: List[Dict[str, Any]], now: datetime):
+        """Insert each exchange, creating conversations for items that had none (no commit)."""
+        new_conversations = []
+        existing_updates = []
+        messages = []
+        for result in results:
+            preview = result["response"][:100] + "..." if len(result["response"]) > 100 else result["response"]
+            if result.get("conversation_id"):
+                existing_updates.append({"_id": result["conversation_id"], "preview": preview, "updated_at": now})
+            else:
+                result["conversation_id"] = new_id()
+                new_conversations.append({
+                    "id": result["conversation_id"],
+                    "title": "New Conversation",
+                    "preview": preview,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+
+            # Strictly increasing timestamps keep each reply after its prompt
+            messages.append({
+                "id": new_id(),
+                "conversation_id": result["conversation_id"],
+                "content": result["prompt"],
+                "role": "user",
+                "created_at": now + timedelta(microseconds=len(messages)),
+            })
+            messages.append({
+                "id": new_id(),
+                "conversation_id": result["conversation_id"],
+                "content": result["response"],
+                "role": "assistant",
+                "created_at": now + timedelta(microseconds=len(messages)),
+            })
+
+        conversations = Conversation.__table__
+        if new_conversations:
+            self.db.execute(insert(conversations), new_conversations)
+        if existing_updates:
+            self.db.execute(
+                update(conversations).where(conversations.c.id == bindparam("_id")).values(
+                    preview=bindparam("preview"),
+                    updated_at=bindparam("updated_at")
+                ),
+                existing_updates
+            )
+        self.db.execute(insert(Message.__table__), messages)
+
+    def results_after(self, job_id: str, after_seq: int, limit: int) -> Tuple[Optional[str], List[tuple]]:
+        """Job status plus finished item rows with result_seq > after_seq.
+
+        The status is read first: once it is terminal every result has already
+        been written, so the rows that follow are complete.
+        """
+        status = self.db.execute(select(BatchJob.status).where(BatchJob.id == job_id)).scalar()
+
+        items = BatchItem.__table__
+        rows = self.db.execute(
+            select(
+                items.c.result_seq,
+                items.c.id,
+                items.c.position,
+                items.c.status,
+                items.c.response,
+                items.c.error,
+                items.c.conversation_id,
+                cast(items.c.completed_at, String)
+            )
+            .where(items.c.job_id == job_id, items.c.result_seq > after_seq)
+            .order_by(items.c.result_seq)
+            .limit(limit)
+        ).all()
+
+        return status, rows
+
+
+def _with_service(method, *args):
+    db = SessionLocal()
+    try:
+        return method(BatchService(db), *args)
+    finally:
+        db.close()
+
+
+async def _call(method, *args):
+    """Run a BatchService method on its own session in a worker thread."""
+    return await asyncio.to_thread(_with_service, method, *args)
+
+
+class _JobState:
+    """In-memory state of a running job."""
+
+    def __init__(self, job: BatchJob):
+        self.job_id = job.id
+        self.provider = job.provider
+        self.model = job.model
+        self.save_conversations = job.save_conversations
+        self.buffer: List[Dict[str, Any]] = []
+        self.flush_lock = asyncio.Lock()
+        self.in_flight: Set[asyncio.Task] = set()
+
+
+class BatchRunner:
+    """Runs batch jobs in the background with bounded per-backend concurrency."""
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        flush_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.concurrency = concurrency or settings.batch_concurrency
+        self.flush_size = flush_size or settings.batch_flush_size
+        self.flush_interval = flush_interval or settings.batch_flush_interval_seconds
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._progress: Dict[str, asyncio.Event] = {}
+        self._cancel_requested: Set[str] = set()
+
+    def start(self, job_id: str):
+        """Start running a job unless it is already running in this process."""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            self._tasks[job_id] = asyncio.create_task(self._run(job_id))
+
+    async def resume(self) -> int:
+        """Restart jobs left queued or running by a previous process."""
+        job_ids = await _call(BatchService.active_job_ids)
+        for job_id in job_ids:
+            self.start(job_id)
+        if job_ids:
+            print(f"Resuming {len(job_ids)} batch job(s)")
+        return len(job_ids)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a job; finished items are kept, pending ones are left unprocessed."""
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            self._cancel_requested.add(job_id)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return True
+
+        job = await _call(BatchService.get_job, job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return False
+        await _call(BatchService.set_status, job_id, "cancelled")
+        self._notify(job_id)
+        return True
+
+    async def shutdown(self):
+        """Stop all jobs, keeping them resumable."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def progress_event(self, job_id: str) -> asyncio.Event:
+        """Event set the next time results of the job are written."""
+        event = self._progress.get(job_id)
+        if event is None:
+            event = self._progress[job_id] = asyncio.Event()
+        return event
+
+    def _notify(self, job_id: str):
+        event = self._progress.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def _limit(self, provider: str) -> asyncio.Semaphore:
+        # Shared by every job that targets the same backend
+        limit = self._limits.get(provider)
+        if limit is None:
+            limit = self._limits[provider] = asyncio.Semaphore(self.concurrency)
+        return limit
+
+    async def _run(self, job_id: str):
+        job = await _call(BatchService.get_job, job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return
+
+        state = _JobState(job)
+        flusher = None
+        try:
+            error = await self._wait_for_backend(state)
+            if error:
+                await _call(BatchService.set_status, job_id, "failed", error)
+                return
+
+            await _call(BatchService.set_status, job_id, "running")
+            flusher = asyncio.create_task(self._flush_periodically(state))
+            await self._dispatch(state)
+
+            flusher.cancel()
+            await self._flush(state)
+            await _call(BatchService.set_status, job_id, "completed")
+        except asyncio.CancelledError:
+            # Keep whatever finished. A user cancel is final; a shutdown leaves
+            # the job running in the database so the next start resumes it
+            await self._cancel_in_flight(state)
+            await self._flush(state)
+            if job_id in self._cancel_requested:
+                await _call(BatchService.set_status, job_id, "cancelled")
+            raise
+        except Exception as e:
+            print(f"Batch job {job_id} failed: {e}")
+            await self._cancel_in_flight(state)
+            await _call(BatchService.set_status, job_id, "failed", str(e))
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+            self._cancel_requested.discard(job_id)
+            self._tasks.pop(job_id, None)
+            self._notify(job_id)
+
+    async def _cancel_in_flight(self, state: _JobState):
+        tasks = list(state.in_flight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _wait_for_backend(self, state: _JobState) -> Optional[str]:
+        """Check the backend once per job, waiting while it is down.
+
+        Returns an error message when the job can never run (unknown model).
+        """
+        while True:
+            health = await llm_connector.check_health(state.provider)
+            if health.get("status") == "healthy":
+                break
+            await asyncio.sleep(BACKEND_RETRY_SECONDS)
+
+        if state.model:
+            models = await llm_connector.get_available_models(state.provider)
+            if state.model not in models:
+                return f"Model '{state.model}' not available for {state.provider}"
+        return None
+
+    async def _dispatch(self, state: _JobState):
+        """Fan pending items out to the backend, never exceeding its limit."""
+        limit = self._limit(state.provider)
+        after_id = ""
+
+        while True:
+            page = await _call(BatchService.pending_items, state.job_id, after_id, DISPATCH_PAGE_SIZE)
+            if not page:
+                break
+
+            for item_id, prompt, conversation_id in page:
+                await limit.acquire()
+                task = asyncio.create_task(self._run_item(state, item_id, prompt, conversation_id))
+                state.in_flight.add(task)
+                task.add_done_callback(state.in_flight.discard)
+                task.add_done_callback(lambda _: limit.release())
+            after_id = page[-1][0]
+
+        if state.in_flight:
+            await asyncio.gather(*list(state.in_flight))
+
+    async def _run_item(self, state: _JobState, item_id: str, prompt: str, conversation_id: Optional[str]):
+        result = {"id": item_id, "prompt": prompt, "conversation_id": conversation_id}
+        try:
+            history = await _call(BatchService.conversation_history, conversation_id) if conversation_id else []
+            parts = []
+            async for delta in llm_connector.stream_response(
+                prompt=prompt,
+                conversation_history=history,
+                model_provider=state.provider,
+                model_override=state.model
+            ):
+                parts.append(delta)
+            result.update(status="done", response="".join(parts))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result.update(status="error", error=str(e))
+
+        state.buffer.append(result)
+        if len(state.buffer) >= self.flush_size:
+            await self._flush(state)
+
+    async def _flush(self, state: _JobState):
+        async with state.flush_lock:
+            if not state.buffer:
+                return
+            results, state.buffer = state.buffer, []
+            await _call(BatchService.record_results, state.job_id, results, state.save_conversations)
+        self._notify(state.job_id)
+
+    async def _flush_periodically(self, state: _JobState):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush(state)
+
+
+async def stream_results(job_id: str, after: int = 0) -> AsyncIterator[bytes]:
+    """Yield finished items as NDJSON lines until the job stops, following new results."""
+    while True:
+        # Take the event before reading so a flush in between is not missed
+        event = batch_runner.progress_event(job_id)
+        status, rows = await _call(BatchService.results_after, job_id, after, RESULT_PAGE_SIZE)
+
+        for seq, item_id, position, item_status, response, error, conversation_id, completed_at in rows:
+            after = seq
+            yield dumps({
+                "seq": seq,
+                "itemId": item_id,
+                "position": position,
+                "status": item_status,
+                "response": response,
+                "error": error,
+                "conversationId": conversation_id,
+                "completedAt": text_timestamp(completed_at),
+            }) + b"\n"
+
+        if len(rows) == RESULT_PAGE_SIZE:
+            continue
+        if status not in ACTIVE_STATUSES:
+            return
+
+        try:
+            await asyncio.wait_for(event.wait(), STREAM_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+# Global batch runner instance
+batch_runner = BatchRunner()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""Benchmark scripts for Bifrost backend.
+
+Each subcommand measures one aspect of backend performance and prints a small
+report. Benchmarks that talk to Ollama or the backend expect them to be running
+locally, like test_backend.py.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Dict, Any
+
+import requests
+
+from config import settings
+
+QUESTIONS = [
+    "What is the capital of France?",
+    "How many people live there?",
+    "What is it best known for?",
+    "Which museums should I visit first?",
+    "What is the best time of year to go?",
+    "How do I get there from the airport?",
+]
+
+SEARCH_CONTEXT = "\n".join(
+    f"[{i}] Example result {i}\nURL: https://example.com/{i}\nContent: " + "Lorem ipsum dolor sit amet. " * 6
+    for i in range(1, 6)
+)
+
+LEGACY_TEMPLATE = """Based on the following web search results, please answer the user's question:
+
+{context}
+
+User's question: {query}
+
+Please provide a comprehensive answer based on the search results and your knowledge."""
+
+
+def _summarize(label: str, samples: List[float]):
+    """Print mean/p50/max for a list of timings in seconds."""
+    if not samples:
+        print(f"   {label}: no samples")
+        return
+    print(
+        f"   {label}: mean {statistics.mean(samples) * 1000:.0f} ms, "
+        f"p50 {statistics.median(samples) * 1000:.0f} ms, "
+        f"max {max(samples) * 1000:.0f} ms"
+    )
+
+
+def _stream_ollama_chat(ollama_url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Send a streaming chat request and return time-to-first-token and the reply."""
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+
+    with requests.post(f"{ollama_url}/api/chat", json=payload, stream=True, timeout=300) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            content = chunk.get("message", {}).get("content", "")
+            if content and ttft is None:
+                ttft = time.perf_counter() - start
+            parts.append(content)
+            if chunk.get("done"):
+                break
+
+    return {"ttft": ttft if ttft is not None else time.perf_counter() - start, "reply": "".join(parts)}
+
+
+def bench_ttft(args):
+    """Time-to-first-token on multi-turn, search-augmented chats.
+
+    Compares the old layout (search context wrapped around the question, no
+    keep_alive/options) with the prefix-stable layout used by LLMConnector.
+    """
+    from llm_connector import llm_connector
+
+    model = args.model or settings.ollama_model
+    print(f"⏱  TTFT benchmark: {args.turns} turns x {args.runs} runs on {model}")
+
+    for layout in ("legacy", "stable"):
+        per_turn: List[List[float]] = [[] for _ in range(args.turns)]
+
+        for _ in range(args.runs):
+            history: List[Dict[str, str]] = []
+            for turn in range(args.turns):
+                query = QUESTIONS[turn % len(QUESTIONS)]
+
+                if layout == "legacy":
+                    messages = history + [{
+                        "role": "user",
+                        "content": LEGACY_TEMPLATE.format(context=SEARCH_CONTEXT, query=query)
+                    }]
+                    payload = {"model": model, "messages": messages, "stream": True}
+                else:
+                    messages = llm_connector.build_messages(query, history, SEARCH_CONTEXT)
+                    payload = llm_connector.ollama_payload(model, messages=messages, stream=True)
+
+                result = _stream_ollama_chat(llm_connector.ollama_url, payload)
+                per_turn[turn].append(result["ttft"])
+
+                history.append({"role": "user", "content": query})
+                history.append({"role": "assistant", "content": result["reply"]})
+
+                if args.idle:
+                    time.sleep(args.idle)
+
+        print(f"\n{layout}:")
+        for turn, samples in enumerate(per_turn, 1):
+            _summarize(f"turn {turn}", samples)
+        _summarize("all turns", [sample for samples in per_turn for sample in samples])
+
+
+def bench_chat_latency(args):
+    """End-to-end /chat latency for search-enabled (or plain) chats."""
+    print(f"⏱  /chat latency: {args.requests} requests, web search {'on' if args.web_search else 'off'}")
+
+    samples = []
+    conversation_id = None
+    for i in range(args.requests):
+        payload = {
+            "query": QUESTIONS[i % len(QUESTIONS)],
+            "webSearchEnabled": args.web_search,
+            "backend": {"type": args.provider, "port": 0},
+        }
+        if conversation_id and args.same_conversation:
+            payload["conversationId"] = conversation_id
+
+        start = time.perf_counter()
+        response = requests.post(f"{args.url}/chat", json=payload, timeout=300)
+        samples.append(time.perf_counter() - start)
+
+        response.raise_for_status()
+        conversation_id = response.json()["conversationId"]
+
+    _summarize("end-to-end", samples)
+
+
+def bench_serialize(args):
+    """Serialization cost of a single conversation with many messages.
+
+    Compares the old path (datetime + strftime per message, nested Pydantic
+    models, jsonable_encoder + json.dumps) with the row-tuple fast path.
+    """
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import BaseModel
+    from fast_json import dumps, text_timestamp, orjson
+
+    class ConversationResponse(BaseModel):
+        id: str
+        title: str
+        timestamp: str
+        preview: str
+        messages: list
+
+    class ConversationsResponse(BaseModel):
+        conversations: List[ConversationResponse]
+
+    start_time = datetime(2025, 1, 1)
+    created = [start_time + timedelta(seconds=i, microseconds=i) for i in range(args.messages)]
+    contents = [f"Message {i}: " + "lorem ipsum dolor sit amet " * 8 for i in range(args.messages)]
+    ids = [f"{i:08d}-0000-7000-8000-000000000000" for i in range(args.messages)]
+    # The fast path reads timestamps as the text SQLite stores
+    created_text = [value.isoformat(sep=" ") for value in created]
+
+    def legacy():
+        model = ConversationsResponse(conversations=[ConversationResponse(
+            id="conversation",
+            title="Benchmark",
+            timestamp=created[-1].strftime("%Y-%m-%dT%H:%M:%SZ"),
+            preview="preview",
+            messages=[
+                {
+                    "id": ids[i],
+                    "content": contents[i],
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "timestamp": created[i].strftime("%Y-%m-%dT%H:%M:%SZ")
+                }
+                for i in range(args.messages)
+            ]
+        )])
+        return json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def fast():
+        return dumps({"conversations": [{
+            "id": "conversation",
+            "title": "Benchmark",
+            "timestamp": text_timestamp(created_text[-1]),
+            "preview": "preview",
+            "messages": [
+                {
+                    "id": ids[i],
+                    "content": contents[i],
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "timestamp": text_timestamp(created_text[i])
+                }
+                for i in range(args.messages)
+            ]
+        }]})
+
+    print(f"⏱  Serialization: {args.messages} messages, {args.runs} runs (orjson {'on' if orjson else 'off'})")
+    for label, func in (("legacy", legacy), ("fast", fast)):
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            body = func()
+            samples.append(time.perf_counter() - start)
+        _summarize(f"{label} ({len(body) / 1024:.0f} KiB)", samples)
+
+    body = fast()
+    start = time.perf_counter()
+    compressed = gzip.compress(body, compresslevel=5)
+    print(f"   gzip level 5: {(time.perf_counter() - start) * 1000:.0f} ms, {len(compressed) / 1024:.0f} KiB")
+
+
+def bench_ids(args):
+    """Insert throughput, file size and history reads: UUID4 vs time-ordered keys.
+
+    Uses the stdlib sqlite3 driver directly against scratch files shaped like
+    the messages table, so it runs without the backend.
+    """
+    import random
+    import sqlite3
+    import uuid
+    from ids import ULIDGenerator
+
+    print(f"⏱  Primary keys: {args.messages} messages across {args.conversations} conversations")
+    content = "lorem ipsum dolor sit amet " * 4
+    scratch = tempfile.mkdtemp()
+
+    for label in ("uuid4", "ulid"):
+        path = os.path.join(scratch, f"{label}.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE messages (id VARCHAR(255) NOT NULL PRIMARY KEY, conversation_id VARCHAR(255) NOT NULL, "
+            "content TEXT NOT NULL, role VARCHAR(20) NOT NULL, created_at DATETIME)"
+        )
+        conn.execute("CREATE INDEX ix_messages_conversation_id_id ON messages (conversation_id, id)")
+
+        generator = ULIDGenerator()
+        make_id = (lambda: str(uuid.uuid4())) if label == "uuid4" else generator.new
+        conversations = [make_id() for _ in range(args.conversations)]
+        rng = random.Random(42)
+        base = datetime(2025, 1, 1)
+
+        start = time.perf_counter()
+        for batch_start in range(0, args.messages, args.batch):
+            rows = []
+            for i in range(batch_start, min(batch_start + args.batch, args.messages)):
+                created = (base + timedelta(milliseconds=i)).isoformat(sep=" ")
+                rows.append((make_id(), rng.choice(conversations), content, "user", created))
+            conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+            conn.commit()
+        elapsed = time.perf_counter() - start
+
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+
+        order = "created_at, id" if label == "uuid4" else "id"
+        sample = rng.sample(conversations, min(200, len(conversations)))
+        read_start = time.perf_counter()
+        for conversation_id in sample:
+            conn.execute(
+                f"SELECT id, content, role, created_at FROM messages WHERE conversation_id = ? ORDER BY {order}",
+                (conversation_id,)
+            ).fetchall()
+        read_elapsed = time.perf_counter() - read_start
+        conn.close()
+
+        print(f"\n{label}:")
+        print(f"   insert: {args.messages / elapsed:,.0f} rows/s")
+        print(f"   file size: {page_count * page_size / 1024 / 1024:.1f} MiB")
+        print(f"   history reads: {read_elapsed / len(sample) * 1000:.2f} ms per conversation (ORDER BY {order})")
+
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_startup(args):
+    """Cold-start cost: `-X importtime` of main and time to first served request.
+
+    Exits non-zero when the time to first request exceeds --budget, so it can
+    gate changes that make startup heavier.
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    print("⏱  Startup benchmark")
+
+    # Import profile of the application module
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=backend_dir, capture_output=True, text=True
+    )
+    # Entries are printed after their children, indented two spaces per level;
+    # main's direct children are the level-1 entries just before main's line
+    module_count = 0
+    main_us = 0
+    children = []
+    pending = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        module_count += 1
+        self_us, cumulative_us, indent, module = match.groups()
+        level = (len(indent) - 1) // 2
+        if level == 1:
+            pending.append((int(cumulative_us), module))
+        elif level == 0:
+            if module == "main":
+                main_us = int(cumulative_us)
+                children = pending
+            pending = []
+
+    print(f"   import main: {main_us / 1000:.0f} ms across {module_count} modules")
+    for cumulative, module in sorted(children, reverse=True)[:args.top]:
+        print(f"      {cumulative / 1000:7.1f} ms  {module}")
+
+    # Time from process spawn to the first successful request. The first run
+    # creates the schema in a scratch database; later runs measure a warm restart.
+    scratch_db = os.path.join(tempfile.mkdtemp(), "startup-bench.db")
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{scratch_db}"}
+    samples = []
+    for _ in range(args.runs):
+        port = _free_port()
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=backend_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while time.perf_counter() - start < 60:
+                try:
+                    if requests.get(f"http://127.0.0.1:{port}/api/config", timeout=1).status_code == 200:
+                        samples.append(time.perf_counter() - start)
+                        break
+                except requests.exceptions.RequestException:
+                    time.sleep(0.01)
+        finally:
+            server.terminate()
+            server.wait()
+
+    _summarize("time to first request", samples)
+    if not samples or max(samples) > args.budget:
+        print(f"   ❌ over budget of {args.budget * 1000:.0f} ms")
+        sys.exit(1)
+    print(f"   ✅ within budget of {args.budget * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bifrost backend benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ttft_parser = subparsers.add_parser("ttft", help="Time-to-first-token on multi-turn chats (needs Ollama)")
+    ttft_parser.add_argument("--model", help="Ollama model (default: OLLAMA_MODEL)")
+    ttft_parser.add_argument("--turns", type=int, default=4)
+    ttft_parser.add_argument("--runs", type=int, default=3)
+    ttft_parser.add_argument("--idle", type=float, default=0.0, help="Seconds to wait between turns")
+    ttft_parser.set_defaults(func=bench_ttft)
+
+    chat_parser = subparsers.add_parser("chat-latency", help="End-to-end /chat latency (needs a running backend)")
+    chat_parser.add_argument("--url", default=f"http://localhost:{settings.port}")
+    chat_parser.add_argument("--provider", default=settings.model_provider)
+    chat_parser.add_argument("--requests", type=int, default=10)
+    chat_parser.add_argument("--no-web-search", dest="web_search", action="store_false")
+    chat_parser.add_argument("--same-conversation", action="store_true", help="Send every request to one conversation")
+    chat_parser.set_defaults(func=bench_chat_latency)
+
+    serialize_parser = subparsers.add_parser("serialize", help="JSON serialization of a large conversation (offline)")
+    serialize_parser.add_argument("--messages", type=int, default=10000)
+    serialize_parser.add_argument("--runs", type=int, default=5)
+    serialize_parser.set_defaults(func=bench_serialize)
+
+    ids_parser = subparsers.add_parser("ids", help="UUID4 vs time-ordered primary keys (offline)")
+    ids_parser.add_argument("--messages", type=int, default=500000)
+    ids_parser.add_argument("--conversations", type=int, default=2000)
+    ids_parser.add_argument("--batch", type=int, default=100, help="Rows per transaction")
+    ids_parser.set_defaults(func=bench_ids)
+
+    startup_parser = subparsers.add_parser("startup", help="Import time and time to first served request")
+    startup_parser.add_argument("--runs", type=int, default=3)
+    startup_parser.add_argument("--top", type=int, default=15, help="Slowest direct imports of main to list")
+    startup_parser.add_argument("--budget", type=float, default=2.0, help="Seconds allowed to first request")
+    startup_parser.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
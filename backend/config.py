@@ -1,7 +1,7 @@
 """Configuration management for Bifrost backend."""
 
 from pydantic_settings import BaseSettings
-from typing import Literal
+from typing import Literal, Optional, Dict, Any
 
 
 class Settings(BaseSettings):
@@ -14,6 +14,13 @@ class Settings(BaseSettings):
     ollama_model: str = "llama3.2"
     lm_studio_model: str = "llama-3.2-3b-instruct"
     
+    # Prompt layout and model residency
+    system_prompt: Optional[str] = None
+    ollama_keep_alive: str = "30m"
+    ollama_options: Dict[str, Any] = {}
+    ollama_model_options: Dict[str, Dict[str, Any]] = {}
+    ollama_warmup: bool = True
+    
     # Database
     database_url: str = "sqlite:///./bifrost.db"
     
@@ -21,6 +28,53 @@ class Settings(BaseSettings):
     web_search_enabled: bool = True
     max_search_results: int = 10
     
+    # Deep search: fetch the top result pages and rank their passages against the query
+    deep_search_pages: int = 3
+    deep_search_per_host: int = 2
+    deep_search_timeout_seconds: float = 6.0
+    deep_search_max_bytes: int = 1_000_000
+    deep_search_workers: int = 2
+    deep_search_chunk_chars: int = 800
+    deep_search_max_chunks: int = 6
+    deep_search_cache_size: int = 256
+    deep_search_cache_ttl_seconds: int = 600
+    
+    # Retention (unset limits disable the background purge)
+    retention_max_age_days: Optional[int] = None
+    retention_max_conversations: Optional[int] = None
+    retention_interval_seconds: int = 3600
+    purge_chunk_size: int = 500
+    vacuum_pages_per_chunk: int = 1000
+    
+    # JSON bodies at least this large are compressed when the client accepts it (0 disables)
+    json_compression_min_bytes: int = 4096
+    
+    # Seconds a cached user config is trusted before a version check
+    config_cache_ttl_seconds: float = 1.0
+    
+    # Concurrent chats allowed on one WebSocket connection
+    ws_max_inflight: int = 4
+    
+    # Streaming generations read concurrently (each holds a dedicated reader thread)
+    max_concurrent_generations: int = 32
+    
+    # Batch jobs: concurrent generations per backend, and how results are persisted
+    batch_concurrency: int = 4
+    batch_max_items: int = 10000
+    batch_flush_size: int = 50
+    batch_flush_interval_seconds: float = 2.0
+    
+    # Background title generation (title_model defaults to the chat's model)
+    title_generation_enabled: bool = True
+    title_model: Optional[str] = None
+    title_queue_size: int = 100
+    title_batch_size: int = 8
+    title_max_wait_seconds: float = 60.0
+    
+    # Diagnostics (admin endpoints are disabled while admin_token is unset)
+    admin_token: Optional[str] = None
+    slow_request_threshold_ms: Optional[int] = None
+    
     # Server
     host: str = "0.0.0.0"
     port: int = 8000
@@ -1,10 +1,23 @@
 """Conversation management service."""
 
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple
+from sqlalchemy import select, update, delete, func, cast, String, Integer
 from sqlalchemy.orm import Session
 from models import Conversation, Message, UserConfig
+from config import settings
+from ids import new_id, is_time_ordered
 from datetime import datetime
-import uuid
+import hashlib
+import threading
+import time
+
+# Conversations deleted per transaction by the bulk delete helpers
+DELETE_CHUNK_SIZE = 500
+
+
+def estimate_tokens(content: str) -> int:
+    """Rough token estimate (~4 characters per token) used for conversation stats."""
+    return (len(content) + 3) // 4
 
 
 class ConversationService:
@@ -16,9 +29,11 @@ class ConversationService:
     def create_conversation(self, title: str = "New Conversation") -> Conversation:
         """Create a new conversation."""
         conversation = Conversation(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             title=title,
             preview="New conversation started...",
+            message_count=0,
+            token_estimate=0,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
@@ -33,19 +48,121 @@ class ConversationService:
         """Get a conversation by ID."""
         return self.db.query(Conversation).filter(Conversation.id == conversation_id).first()
     
-    def get_all_conversations(self) -> List[Conversation]:
-        """Get all conversations."""
-        return self.db.query(Conversation).order_by(Conversation.updated_at.desc()).all()
+    def get_conversation_rows(
+        self,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        sort: str = "updated",
+        min_messages: int = 0
+    ) -> List[Tuple]:
+        """Get conversation listing rows as plain tuples.
+        
+        Columns: id, title, preview, updated_at, message_count, last_message_at,
+        last_role, token_estimate. Timestamps are returned as stored text to
+        skip datetime parsing on large listings.
+        """
+        query = self.db.query(
+            Conversation.id,
+            Conversation.title,
+            Conversation.preview,
+            cast(Conversation.updated_at, String),
+            Conversation.message_count,
+            cast(Conversation.last_message_at, String),
+            Conversation.last_role,
+            Conversation.token_estimate
+        )
+        return self._listing(query, limit, offset, sort, min_messages).all()
+    
+    def _listing(self, query, limit: Optional[int], offset: int, sort: str, min_messages: int):
+        """Apply listing filters, ordering and paging to a conversations query."""
+        sort_columns = {
+            "updated": Conversation.updated_at,
+            "lastMessage": Conversation.last_message_at,
+            "messageCount": Conversation.message_count,
+        }
+        if sort not in sort_columns:
+            raise ValueError(f"Unsupported sort: {sort}")
+        
+        if min_messages > 0:
+            query = query.filter(Conversation.message_count >= min_messages)
+        
+        query = query.order_by(sort_columns[sort].desc(), Conversation.id)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return query
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete a conversation and all its messages."""
-        conversation = self.get_conversation(conversation_id)
-        if not conversation:
-            return False
+        return self.delete_conversations([conversation_id]) > 0
+    
+    def delete_conversations(
+        self,
+        conversation_ids: List[str],
+        chunk_size: int = DELETE_CHUNK_SIZE,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Delete conversations and their messages with set-based SQL.
         
-        self.db.delete(conversation)
-        self.db.commit()
-        return True
+        Work is split into chunks, each in its own short transaction, so large
+        deletes never load messages into memory or hold the write lock for long.
+        """
+        messages = Message.__table__
+        conversations = Conversation.__table__
+        deleted = 0
+        
+        for start in range(0, len(conversation_ids), chunk_size):
+            chunk = conversation_ids[start:start + chunk_size]
+            self.db.execute(delete(messages).where(messages.c.conversation_id.in_(chunk)))
+            result = self.db.execute(delete(conversations).where(conversations.c.id.in_(chunk)))
+            self.db.commit()
+            
+            deleted += result.rowcount
+            if on_chunk:
+                on_chunk(result.rowcount)
+        
+        return deleted
+    
+    def delete_conversations_older_than(
+        self,
+        cutoff: datetime,
+        chunk_size: int = DELETE_CHUNK_SIZE,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Delete conversations not updated since `cutoff`, one chunk at a time."""
+        deleted = 0
+        while True:
+            ids = [
+                row[0] for row in self.db.query(Conversation.id)
+                .filter(Conversation.updated_at < cutoff)
+                .limit(chunk_size)
+                .all()
+            ]
+            if not ids:
+                return deleted
+            deleted += self.delete_conversations(ids, chunk_size, on_chunk)
+    
+    def delete_conversations_beyond(
+        self,
+        keep: int,
+        chunk_size: int = DELETE_CHUNK_SIZE,
+        on_chunk: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Delete all but the `keep` most recently updated conversations."""
+        deleted = 0
+        while True:
+            ids = [
+                row[0] for row in self.db.query(Conversation.id)
+                .order_by(Conversation.updated_at.desc(), Conversation.id)
+                .offset(keep)
+                .limit(chunk_size)
+                .all()
+            ]
+            if not ids:
+                return deleted
+            deleted += self.delete_conversations(ids, chunk_size, on_chunk)
     
     def add_message(
         self, 
@@ -59,7 +176,7 @@ class ConversationService:
             return None
         
         message = Message(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             conversation_id=conversation_id,
             content=content,
             role=role,
@@ -68,23 +185,84 @@ class ConversationService:
         
         self.db.add(message)
         
-        # Update conversation preview and timestamp
+        # Update conversation preview, timestamp and stats in the same transaction.
+        # Counters are SQL expressions so concurrent writers don't lose increments.
         conversation.preview = content[:100] + "..." if len(content) > 100 else content
         conversation.updated_at = datetime.utcnow()
+        conversation.message_count = Conversation.message_count + 1
+        conversation.last_message_at = message.created_at
+        conversation.last_role = role
+        conversation.token_estimate = Conversation.token_estimate + estimate_tokens(content)
         
         self.db.commit()
         self.db.refresh(message)
         
         return message
     
-    def get_conversation_messages(self, conversation_id: str) -> List[Message]:
-        """Get all messages for a conversation."""
-        return (
+    def get_conversation_messages(
+        self,
+        conversation_id: str,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Message]:
+        """Get messages for a conversation, oldest first."""
+        query = (
             self.db.query(Message)
             .filter(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.asc())
-            .all()
+            .order_by(*self._history_order(conversation_id))
+        )
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return query.all()
+    
+    def get_message_rows(
+        self,
+        conversation_ids: List[str],
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Tuple]:
+        """Get messages for one or more conversations as plain tuples, oldest first.
+        
+        Columns: conversation_id, id, content, role, created_at (as stored text).
+        """
+        if not conversation_ids:
+            return []
+        
+        query = (
+            self.db.query(
+                Message.conversation_id,
+                Message.id,
+                Message.content,
+                Message.role,
+                cast(Message.created_at, String)
+            )
+            .filter(Message.conversation_id.in_(conversation_ids))
         )
+        if len(conversation_ids) == 1:
+            query = query.order_by(*self._history_order(conversation_ids[0]))
+        else:
+            query = query.order_by(Message.conversation_id, Message.created_at.asc(), Message.id)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        return query.all()
+    
+    def _history_order(self, conversation_id: str) -> tuple:
+        """ORDER BY for one conversation's messages.
+        
+        Conversations created with time-ordered IDs only contain time-ordered
+        message IDs, so the (conversation_id, id) index returns them in order
+        without a sort. Older conversations may hold UUID4 message IDs and
+        are ordered by timestamp.
+        """
+        if is_time_ordered(conversation_id):
+            return (Message.id.asc(),)
+        return (Message.created_at.asc(), Message.id)
     
     def get_conversation_history(self, conversation_id: str) -> List[Dict[str, Any]]:
         """Get conversation history in the format expected by LLM."""
@@ -108,10 +286,65 @@ class ConversationService:
         self.db.commit()
         
         return True
+    
+    def recompute_stats(self, conversation_ids: Optional[List[str]] = None) -> int:
+        """Recompute denormalized conversation stats from the messages table.
+        
+        Repairs drift from writes that bypassed add_message. Runs as a single
+        set-based UPDATE; returns the number of conversations touched.
+        """
+        messages = Message.__table__
+        conversations = Conversation.__table__
+        belongs = messages.c.conversation_id == conversations.c.id
+        
+        message_count = select(func.count()).where(belongs).scalar_subquery()
+        last_message_at = select(func.max(messages.c.created_at)).where(belongs).scalar_subquery()
+        last_role = (
+            select(messages.c.role)
+            .where(belongs)
+            # id breaks ties between messages stored in the same instant
+            .order_by(messages.c.created_at.desc(), messages.c.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        # Per-message integer estimate, matching estimate_tokens(); SQLAlchemy 2.x
+        # compiles "/" as true division, so the cast truncates each term
+        token_estimate = (
+            select(func.coalesce(func.sum(cast((func.length(messages.c.content) + 3) / 4, Integer)), 0))
+            .where(belongs)
+            .scalar_subquery()
+        )
+        
+        stmt = update(conversations).values(
+            message_count=message_count,
+            last_message_at=last_message_at,
+            last_role=last_role,
+            token_estimate=token_estimate,
+            # Keep the activity timestamp; otherwise onupdate would stamp "now"
+            updated_at=conversations.c.updated_at
+        )
+        if conversation_ids is not None:
+            stmt = stmt.where(conversations.c.id.in_(conversation_ids))
+        
+        result = self.db.execute(stmt)
+        self.db.commit()
+        
+        return result.rowcount
+
+
+# Write-through cache of user config snapshots, keyed by user_id
+_config_cache: Dict[str, Dict[str, Any]] = {}
+_config_cache_lock = threading.Lock()
 
 
 class UserConfigService:
-    """Service for managing user configuration."""
+    """Service for managing user configuration.
+    
+    Reads go through an in-process cache that update_config writes through.
+    Entries younger than config_cache_ttl_seconds are served without touching
+    the database; older ones are revalidated with a primary-key lookup of
+    updated_at, which is how other worker processes' writes are picked up.
+    """
     
     def __init__(self, db: Session):
         self.db = db
@@ -128,6 +361,27 @@ class UserConfigService:
         
         return config
     
+    def get_config_snapshot(self, user_id: str = "default") -> Dict[str, Any]:
+        """Get a cached, read-only snapshot of the user configuration."""
+        entry = _config_cache.get(user_id)
+        now = time.monotonic()
+        
+        if entry is not None:
+            if now - entry["checked_at"] < settings.config_cache_ttl_seconds:
+                return entry
+            
+            # Cheap version check: has anyone (including another worker) changed it?
+            updated_at = (
+                self.db.query(UserConfig.updated_at)
+                .filter(UserConfig.user_id == user_id)
+                .scalar()
+            )
+            if updated_at == entry["updated_at"]:
+                entry["checked_at"] = now
+                return entry
+        
+        return self._store_snapshot(self.get_config(user_id))
+    
     def update_config(self, user_id: str, config_data: Dict[str, Any]) -> UserConfig:
         """Update user configuration."""
         config = self.get_config(user_id)
@@ -141,4 +395,26 @@ class UserConfigService:
         self.db.commit()
         self.db.refresh(config)
         
+        self._store_snapshot(config)
         return config
+    
+    def _store_snapshot(self, config: UserConfig) -> Dict[str, Any]:
+        """Cache a snapshot of `config` along with its HTTP validators."""
+        updated_at = config.updated_at
+        version = hashlib.sha1(f"{config.user_id}:{updated_at.isoformat()}".encode()).hexdigest()[:16]
+        
+        entry = {
+            "user_id": config.user_id,
+            "backend_type": config.backend_type,
+            "backend_port": config.backend_port,
+            "accent_color": config.accent_color,
+            "web_search_enabled": config.web_search_enabled,
+            "updated_at": updated_at,
+            "etag": f'"{version}"',
+            "checked_at": time.monotonic()
+        }
+        
+        with _config_cache_lock:
+            _config_cache[config.user_id] = entry
+        
+        return entry
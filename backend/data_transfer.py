@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Streaming NDJSON export and import of conversations.
+
+Each line is a JSON object with a ``type`` of ``conversation`` or ``message``.
+All conversations are written before any message so an import can insert
+parents first. Memory use is bounded by the chunk and batch sizes below, not by
+the size of the database.
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import zlib
+from datetime import datetime
+from typing import Iterator, Iterable, AsyncIterator, Dict, Any, List, Optional
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+from models import Conversation, Message
+from conversation_service import ConversationService
+
+# Rows fetched per round trip while exporting
+EXPORT_CHUNK_SIZE = 5000
+
+# Rows per executemany() call while importing
+IMPORT_BATCH_SIZE = 5000
+
+# Rows per transaction while importing
+IMPORT_COMMIT_EVERY = 100000
+
+# Conversations per statement when recomputing stats after an import
+STATS_CHUNK_SIZE = 500
+
+CONVERSATION_FIELDS = ("id", "title", "preview", "created_at", "updated_at")
+MESSAGE_FIELDS = ("id", "conversation_id", "content", "role", "created_at")
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _parse_iso(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _stream_rows(db: Session, table, fields, record_type: str) -> Iterator[bytes]:
+    """Yield one encoded block of NDJSON lines per fetched chunk of rows."""
+    columns = [table.c[field] for field in fields]
+    stmt = select(*columns).execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE)
+    result = db.execute(stmt)
+
+    for rows in result.partitions(EXPORT_CHUNK_SIZE):
+        lines = []
+        for row in rows:
+            record = {"type": record_type}
+            for field, value in zip(fields, row):
+                record[field] = _iso(value) if isinstance(value, datetime) else value
+            lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        lines.append("")
+        yield "\n".join(lines).encode("utf-8")
+
+
+def export_ndjson(db: Session, compress: bool = False) -> Iterator[bytes]:
+    """Stream all conversations and messages as (optionally gzipped) NDJSON."""
+    chunks = _stream_rows(db, Conversation.__table__, CONVERSATION_FIELDS, "conversation")
+    message_chunks = _stream_rows(db, Message.__table__, MESSAGE_FIELDS, "message")
+
+    if not compress:
+        yield from chunks
+        yield from message_chunks
+        return
+
+    # wbits=31 produces a gzip container that `gunzip` and gzip.open() understand
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk_iter in (chunks, message_chunks):
+        for chunk in chunk_iter:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    yield compressor.flush()
+
+
+class NDJSONImporter:
+    """Batched importer for NDJSON produced by export_ndjson.
+
+    Lines are buffered and written with executemany() in large transactions.
+    Existing rows with the same primary key are kept, so an import can be
+    re-run safely after an interruption.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.conversations: List[Dict[str, Any]] = []
+        self.messages: List[Dict[str, Any]] = []
+        self.touched_conversations = set()
+        self.imported = {"conversations": 0, "messages": 0}
+        self._uncommitted = 0
+
+        dialect = db.get_bind().dialect.name
+        self._conversation_insert = insert(Conversation.__table__)
+        self._message_insert = insert(Message.__table__)
+        if dialect == "sqlite":
+            self._conversation_insert = self._conversation_insert.prefix_with("OR IGNORE")
+            self._message_insert = self._message_insert.prefix_with("OR IGNORE")
+
+    @property
+    def pending(self) -> int:
+        return len(self.conversations) + len(self.messages)
+
+    def feed_line(self, line: bytes) -> bool:
+        """Buffer one NDJSON line; returns True once a batch is ready to flush."""
+        line = line.strip()
+        if not line:
+            return False
+
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError("Each line must be a JSON object")
+        record_type = record.get("type")
+        if record_type == "conversation":
+            self.conversations.append({
+                "id": record["id"],
+                "title": record.get("title") or "New Conversation",
+                "preview": record.get("preview"),
+                "created_at": _parse_iso(record.get("created_at")),
+                "updated_at": _parse_iso(record.get("updated_at")),
+            })
+            self.touched_conversations.add(record["id"])
+        elif record_type == "message":
+            self.messages.append({
+                "id": record["id"],
+                "conversation_id": record["conversation_id"],
+                "content": record["content"],
+                "role": record["role"],
+                "created_at": _parse_iso(record.get("created_at")),
+            })
+            self.touched_conversations.add(record["conversation_id"])
+        else:
+            raise ValueError(f"Unknown record type: {record_type}")
+
+        return self.pending >= IMPORT_BATCH_SIZE
+
+    def flush(self):
+        """Write buffered rows, committing once the transaction is large enough."""
+        # Parents first so messages never precede their conversation
+        if self.conversations:
+            result = self.db.execute(self._conversation_insert, self.conversations)
+            self.imported["conversations"] += max(result.rowcount, 0)
+        if self.messages:
+            result = self.db.execute(self._message_insert, self.messages)
+            self.imported["messages"] += max(result.rowcount, 0)
+
+        self._uncommitted += self.pending
+        self.conversations = []
+        self.messages = []
+
+        if self._uncommitted >= IMPORT_COMMIT_EVERY:
+            self.db.commit()
+            self._uncommitted = 0
+
+    def finish(self) -> Dict[str, int]:
+        """Flush remaining rows, commit and refresh stats for touched conversations."""
+        self.flush()
+        self.db.commit()
+
+        conversation_service = ConversationService(self.db)
+        touched = list(self.touched_conversations)
+        for start in range(0, len(touched), STATS_CHUNK_SIZE):
+            conversation_service.recompute_stats(touched[start:start + STATS_CHUNK_SIZE])
+
+        return dict(self.imported)
+
+
+def import_ndjson(db: Session, lines: Iterable[bytes]) -> Dict[str, int]:
+    """Import NDJSON lines into the database."""
+    importer = NDJSONImporter(db)
+    for line in lines:
+        if importer.feed_line(line):
+            importer.flush()
+    return importer.finish()
+
+
+def _decompress(step, *args) -> bytes:
+    """Run a zlib step, reporting corrupt gzip data as invalid input."""
+    try:
+        return step(*args)
+    except zlib.error as e:
+        raise ValueError(f"Corrupt gzip data: {e}")
+
+
+async def import_ndjson_stream(db: Session, chunks: AsyncIterator[bytes]) -> Dict[str, int]:
+    """Import an NDJSON byte stream (plain or gzip), e.g. an HTTP request body.
+
+    Parsing happens as chunks arrive; database writes run in a worker thread so
+    the event loop stays responsive during large imports.
+    """
+    importer = NDJSONImporter(db)
+    decompressor = None
+    first_chunk = True
+    buffer = b""
+
+    async for chunk in chunks:
+        if first_chunk and chunk:
+            first_chunk = False
+            if chunk[:2] == b"\x1f\x8b":
+                decompressor = zlib.decompressobj(31)
+        if decompressor is not None:
+            chunk = _decompress(decompressor.decompress, chunk)
+
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            if importer.feed_line(line):
+                await asyncio.to_thread(importer.flush)
+
+    if decompressor is not None:
+        buffer += _decompress(decompressor.flush)
+    for line in buffer.split(b"\n"):
+        importer.feed_line(line)
+
+    return await asyncio.to_thread(importer.finish)
+
+
+def _open_input(path: str):
+    if path == "-":
+        return sys.stdin.buffer
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def main(argv: Optional[List[str]] = None):
+    """Command line entry point."""
+    from database import SessionLocal, create_tables
+
+    parser = argparse.ArgumentParser(description="Export or import Bifrost conversations as NDJSON")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write conversations to NDJSON")
+    export_parser.add_argument("output", help="Output file ('-' for stdout, '.gz' suffix to compress)")
+
+    import_parser = subparsers.add_parser("import", help="Load conversations from NDJSON")
+    import_parser.add_argument("input", help="Input file ('-' for stdin, '.gz' suffix if compressed)")
+
+    args = parser.parse_args(argv)
+    create_tables()
+    db = SessionLocal()
+
+    try:
+        if args.command == "export":
+            compress = args.output.endswith(".gz")
+            output = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+            try:
+                for chunk in export_ndjson(db, compress=compress):
+                    output.write(chunk)
+            finally:
+                if output is not sys.stdout.buffer:
+                    output.close()
+        else:
+            source = _open_input(args.input)
+            try:
+                counts = import_ndjson(db, source)
+            finally:
+                if source is not sys.stdin.buffer:
+                    source.close()
+            print(f"Imported {counts['conversations']} conversations and {counts['messages']} messages")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
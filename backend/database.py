@@ -1,9 +1,11 @@
 """Database connection and session management."""
 
-from sqlalchemy import create_engine
+from typing import List, Tuple, Optional
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from config import settings
 from models import Base
+from conversation_service import ConversationService
 
 # Create database engine
 engine = create_engine(settings.database_url, connect_args={"check_same_thread": False})
@@ -11,10 +13,158 @@ engine = create_engine(settings.database_url, connect_args={"check_same_thread":
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Bump whenever models change so existing databases are migrated on next start
+SCHEMA_VERSION = 3
 
-def create_tables():
-    """Create all database tables."""
+# Indexes created by older versions that newer ones replace
+STALE_INDEXES = ["ix_messages_conversation_id"]
+
+
+def create_tables() -> List[Tuple[str, str]]:
+    """Create all database tables and bring existing ones up to date.
+
+    Skipped entirely when the SQLite schema version already matches, so
+    restarts don't pay for reflection. Columns added to existing tables are
+    backfilled before the new version is recorded, whichever entry point (app
+    or CLI) runs the migration. Returns the (table, column) pairs added.
+    """
+    if _stored_schema_version() == SCHEMA_VERSION:
+        return []
+
+    ensure_incremental_vacuum()
     Base.metadata.create_all(bind=engine)
+    added_columns = _add_missing_columns()
+    _drop_stale_indexes()
+    _create_missing_indexes()
+    _backfill(added_columns)
+    _store_schema_version()
+    return added_columns
+
+
+def _backfill(added_columns: List[Tuple[str, str]]):
+    """Populate columns that were just added to tables created by older versions."""
+    if any(table == "conversations" for table, _ in added_columns):
+        # Denormalized stats start at their zero defaults; derive them from messages
+        db = SessionLocal()
+        try:
+            ConversationService(db).recompute_stats()
+        finally:
+            db.close()
+
+
+def _stored_schema_version() -> Optional[int]:
+    """Read the schema version recorded in the SQLite header (None elsewhere)."""
+    if engine.dialect.name != "sqlite":
+        return None
+
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA user_version")).scalar()
+
+
+def _store_schema_version():
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION}"))
+
+
+def _add_missing_columns() -> List[Tuple[str, str]]:
+    """Add model columns that are missing from tables created by older versions."""
+    inspector = inspect(engine)
+    added = []
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    ddl += f" DEFAULT '{default}'" if isinstance(default, str) else f" DEFAULT {default}"
+                    if not column.nullable:
+                        ddl += " NOT NULL"
+
+                conn.execute(text(ddl))
+                added.append((table.name, column.name))
+
+    return added
+
+
+def _drop_stale_indexes():
+    """Drop indexes superseded by ones declared on the current models."""
+    with engine.begin() as conn:
+        for name in STALE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def _create_missing_indexes():
+    """Create indexes declared on the models but absent from existing tables."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def ensure_incremental_vacuum(convert_existing: bool = False) -> bool:
+    """Put SQLite databases in incremental auto-vacuum mode.
+
+    The pragma only takes effect on an empty database, so new databases get it
+    for free; an existing file is converted with a one-off VACUUM when
+    convert_existing is set. Returns True if incremental vacuum is active.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.connect() as conn:
+        if conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+            return True
+
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        if convert_existing:
+            conn.execute(text("VACUUM"))
+
+        return conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+
+
+def incremental_vacuum(pages: int):
+    """Release up to `pages` free pages back to the filesystem."""
+    if engine.dialect.name != "sqlite":
+        return
+
+    with engine.connect() as conn:
+        # The pragma frees one page per step and pysqlite steps it only once
+        # (returning no rows), so run it to completion as a script instead
+        conn.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+
+
+def freelist_count() -> int:
+    """Number of unused pages in the SQLite file (0 elsewhere)."""
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+
+
+def reclaim_free_pages(pages_per_step: int) -> int:
+    """Release every free page, `pages_per_step` at a time; returns pages released.
+
+    Each step is its own short write, so other writers get in between steps.
+    """
+    released = 0
+    remaining = freelist_count()
+    while remaining > 0:
+        incremental_vacuum(pages_per_step)
+        left = freelist_count()
+        if left >= remaining:
+            # Not in incremental mode (or nothing could be released)
+            break
+        released += remaining - left
+        remaining = left
+    return released
 
 
 def get_db():
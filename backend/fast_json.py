@@ -0,0 +1,82 @@
+"""Fast JSON responses for large API payloads.
+
+Handlers that return big listings build plain dicts/lists straight from
+database rows and hand them to FastJSONResponse, skipping Pydantic model
+construction and FastAPI's jsonable_encoder. orjson is used when installed;
+large bodies are compressed when the client accepts it.
+"""
+
+import gzip
+import json
+from typing import Any, Mapping, Optional
+from fastapi.responses import Response
+from config import settings
+from http_cache import accepted_encodings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def text_timestamp(value: Optional[str]) -> Optional[str]:
+    """Turn a timestamp stored as text ('YYYY-MM-DD HH:MM:SS[.ffffff]') into API format.
+
+    Selecting DATETIME columns as text and slicing is far cheaper than having
+    the driver parse a datetime and then calling strftime on it.
+    """
+    if not value:
+        return None
+    return f"{value[:10]}T{value[11:19]}Z"
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson (when available) and optional compression.
+
+    Pass the request headers to let bodies above json_compression_min_bytes be
+    brotli/gzip-compressed according to Accept-Encoding.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any, request_headers: Optional[Mapping[str, str]] = None, **kwargs):
+        super().__init__(content, **kwargs)
+
+        encoding = self._choose_encoding(request_headers)
+        if encoding == "br":
+            self.body = brotli.compress(self.body, quality=4)
+        elif encoding == "gzip":
+            self.body = gzip.compress(self.body, compresslevel=5)
+        else:
+            return
+
+        self.headers["content-length"] = str(len(self.body))
+        self.headers["content-encoding"] = encoding
+        self.headers["vary"] = "Accept-Encoding"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+    def _choose_encoding(self, request_headers: Optional[Mapping[str, str]]) -> Optional[str]:
+        min_bytes = settings.json_compression_min_bytes
+        if request_headers is None or not min_bytes or len(self.body) < min_bytes:
+            return None
+
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
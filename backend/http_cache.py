@@ -0,0 +1,77 @@
+"""Helpers for HTTP validators (ETag / Last-Modified), conditional requests and content negotiation."""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Set
+
+
+def http_date(value: datetime) -> str:
+    """Format a naive UTC datetime as an HTTP date."""
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """Check an If-Modified-Since header against a naive UTC timestamp."""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+
+    modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return modified <= since
+
+
+def is_not_modified(
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    etag: str,
+    last_modified: Optional[datetime] = None
+) -> bool:
+    """Evaluate conditional request headers; If-None-Match takes precedence."""
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+    if last_modified is not None:
+        return not_modified_since(if_modified_since, last_modified)
+    return False
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    """Parse Accept-Encoding into the set of codings with a non-zero q-value."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
@@ -1,130 +1,273 @@
 """Unified LLM connector for Ollama and LM Studio."""
 
+import asyncio
+import socket
+import threading
 import requests
 import json
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, AsyncIterator
 from config import settings
 
 
 class LLMConnector:
-    """Unified connector for different LLM backends."""
+    """Unified connector for different LLM backends.
+    
+    HTTP calls run in worker threads so they never block the event loop and
+    independent calls (health checks, generation, web search) can overlap.
+    Streaming readers hold their thread for a whole generation, so they get a
+    dedicated pool; the loop's default executor stays free for short calls.
+    """
     
     def __init__(self):
         self.ollama_url = f"http://localhost:{settings.ollama_port}"
         self.lm_studio_url = f"http://localhost:{settings.lm_studio_port}"
+        self.stream_executor = ThreadPoolExecutor(
+            max_workers=settings.max_concurrent_generations,
+            thread_name_prefix="llm-stream"
+        )
     
     async def generate_response(
         self, 
         prompt: str, 
         conversation_history: Optional[list] = None,
         model_provider: Optional[str] = None,
-        model_override: Optional[str] = None
+        model_override: Optional[str] = None,
+        context: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generate response using the specified model provider."""
+        """Generate response using the specified model provider.
+        
+        `context` (e.g. web search results) is appended after the user's prompt
+        so everything before it stays byte-identical across turns. The reply is
+        collected from the streaming API, so cancelling the caller aborts the
+        upstream generation instead of letting it run to completion.
+        """
+        
+        provider = model_provider or settings.model_provider
+        parts = [
+            delta async for delta in self.stream_response(
+                prompt, conversation_history, provider, model_override, context
+            )
+        ]
+        content = "".join(parts)
+        
+        # Keep each provider's response shape
+        if provider == "lmstudio":
+            return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+        return {"message": {"role": "assistant", "content": content}, "done": True}
+    
+    async def stream_response(
+        self,
+        prompt: str,
+        conversation_history: Optional[list] = None,
+        model_provider: Optional[str] = None,
+        model_override: Optional[str] = None,
+        context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream response text deltas from the specified model provider.
+        
+        Closing the generator (or cancelling the task consuming it) drops the
+        upstream HTTP connection, which makes Ollama/LM Studio stop generating.
+        """
         
         provider = model_provider or settings.model_provider
+        messages = self.build_messages(prompt, conversation_history, context)
         
         if provider == "ollama":
-            return await self._generate_with_ollama(prompt, conversation_history, model_override)
+            model = model_override or settings.ollama_model
+            attempts = [
+                # Chat endpoint first (Ollama >= 0.1.26)
+                (
+                    f"{self.ollama_url}/api/chat",
+                    self.ollama_payload(model, messages=messages, stream=True),
+                    None,
+                    self._parse_ollama_chat_line
+                ),
+                # Fallback for older Ollama: /api/generate with a concatenated prompt
+                (
+                    f"{self.ollama_url}/api/generate",
+                    self.ollama_payload(model, prompt=self._build_prompt_from_messages(messages), stream=True),
+                    None,
+                    self._parse_ollama_generate_line
+                ),
+            ]
+            error_prefix = "Ollama API error"
         elif provider == "lmstudio":
-            return await self._generate_with_lm_studio(prompt, conversation_history, model_override)
+            payload = {
+                "model": model_override or settings.lm_studio_model,
+                "messages": messages,
+                "temperature": 0.7,
+                "max_tokens": 2000,
+                "stream": True
+            }
+            headers = {
+                "Content-Type": "application/json",
+                "Authorization": "Bearer lm-studio"
+            }
+            attempts = [
+                (f"{self.lm_studio_url}/v1/chat/completions", payload, headers, self._parse_openai_sse_line)
+            ]
+            error_prefix = "LM Studio API error"
         else:
             raise ValueError(f"Unsupported model provider: {provider}")
-    
-    async def _generate_with_ollama(
-        self, 
-        prompt: str, 
+        
+        async for delta in self._stream_request(attempts, error_prefix):
+            yield delta
+
+    def build_messages(
+        self,
+        prompt: str,
         conversation_history: Optional[list] = None,
-        model_override: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Generate response using Ollama API."""
+        context: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Build a prefix-stable message list.
         
-        # Build messages for chat format
+        The system prompt and history are passed through unchanged and the
+        current prompt is sent verbatim, so the backend can reuse its KV cache
+        for the shared conversation prefix. Injected context only ever goes at
+        the very end.
+        """
         messages = []
+        if settings.system_prompt:
+            messages.append({"role": "system", "content": settings.system_prompt})
         if conversation_history:
             messages.extend(conversation_history)
-        messages.append({"role": "user", "content": prompt})
         
-        payload = {
-            "model": model_override or settings.ollama_model,
-            "messages": messages,
-            "stream": False
-        }
-        
-        try:
-            # Try chat endpoint first (Ollama >= 0.1.26)
-            response = requests.post(
-                f"{self.ollama_url}/api/chat",
-                json=payload,
-                timeout=60
+        content = prompt
+        if context:
+            content = (
+                f"{prompt}\n\n"
+                "---\n"
+                "Web search results for the question above. Use them together with "
+                "your own knowledge to give a comprehensive answer:\n\n"
+                f"{context}"
             )
-            if response.status_code == 404:
-                # Fallback for older Ollama: use /api/generate with a concatenated prompt
-                concat_prompt = self._build_prompt_from_messages(messages)
-                gen_payload = {
-                    "model": payload["model"],
-                    "prompt": concat_prompt,
-                    "stream": False
-                }
-                gen_resp = requests.post(
+        messages.append({"role": "user", "content": content})
+        
+        return messages
+    
+    def ollama_payload(self, model: str, **fields: Any) -> Dict[str, Any]:
+        """Build an Ollama request body with the configured keep_alive and options."""
+        payload = {"model": model, **fields, "keep_alive": settings.ollama_keep_alive}
+        
+        options = {**settings.ollama_options, **settings.ollama_model_options.get(model, {})}
+        if options:
+            payload["options"] = options
+        
+        return payload
+    
+    async def warm_up(self, models: Optional[List[str]] = None):
+        """Load Ollama models into memory ahead of the first request."""
+        for model in models or [settings.ollama_model]:
+            try:
+                # A generate request without a prompt just loads the model
+                await asyncio.to_thread(
+                    requests.post,
                     f"{self.ollama_url}/api/generate",
-                    json=gen_payload,
-                    timeout=60
+                    json=self.ollama_payload(model),
+                    timeout=120
                 )
-                gen_resp.raise_for_status()
-                gen_json = gen_resp.json()
-                # Normalize to chat-like response
-                return {
-                    "message": {
-                        "role": "assistant",
-                        "content": gen_json.get("response", "")
-                    },
-                    "done": gen_json.get("done", True)
-                }
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Ollama API error: {str(e)}")
+            except requests.exceptions.RequestException as e:
+                print(f"Model warm-up failed for {model}: {e}")
     
-    async def _generate_with_lm_studio(
-        self, 
-        prompt: str, 
-        conversation_history: Optional[list] = None,
-        model_override: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """Generate response using LM Studio API (OpenAI compatible)."""
+    async def _stream_request(self, attempts: list, error_prefix: str) -> AsyncIterator[str]:
+        """POST a streaming request in a worker thread and yield parsed deltas.
         
-        # Build messages for OpenAI format
-        messages = []
-        if conversation_history:
-            messages.extend(conversation_history)
-        messages.append({"role": "user", "content": prompt})
+        `attempts` are (url, payload, headers, parse_line) tuples tried in
+        order; a 404 moves on to the next one. The reader thread hands deltas
+        to the event loop through a queue and checks a stop flag between
+        chunks. On cancellation the socket is shut down so a pending read
+        returns immediately and the backend sees the client go away.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        active = {}
         
-        payload = {
-            "model": model_override or settings.lm_studio_model,
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 2000,
-            "stream": False
-        }
+        def emit(kind: str, value: Any = None):
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
         
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": "Bearer lm-studio"
-        }
+        def read():
+            try:
+                for index, (url, payload, headers, parse_line) in enumerate(attempts):
+                    with requests.post(url, json=payload, headers=headers, stream=True, timeout=(5, 60)) as response:
+                        active["response"] = response
+                        if stop.is_set():
+                            return
+                        if response.status_code == 404 and index < len(attempts) - 1:
+                            continue
+                        response.raise_for_status()
+                        
+                        for line in response.iter_lines():
+                            if stop.is_set():
+                                return
+                            if not line:
+                                continue
+                            delta, done = parse_line(line)
+                            if delta:
+                                emit("delta", delta)
+                            if done:
+                                break
+                        return
+            except requests.exceptions.RequestException as e:
+                if not stop.is_set():
+                    emit("error", Exception(f"{error_prefix}: {str(e)}"))
+            except Exception as e:
+                if not stop.is_set():
+                    emit("error", e)
+            finally:
+                emit("end")
         
+        # Beyond max_concurrent_generations, new streams wait for a free reader
+        reader = loop.run_in_executor(self.stream_executor, read)
         try:
-            response = requests.post(
-                f"{self.lm_studio_url}/v1/chat/completions",
-                json=payload,
-                headers=headers,
-                timeout=60
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"LM Studio API error: {str(e)}")
+            while True:
+                kind, value = await queue.get()
+                if kind == "delta":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    break
+        finally:
+            if not reader.done():
+                stop.set()
+                self._abort_response(active.get("response"))
     
+    def _abort_response(self, response: Optional[requests.Response]):
+        """Drop an in-flight streaming response's connection from another thread."""
+        if response is None:
+            return
+        connection = getattr(response.raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    
+    def _parse_ollama_chat_line(self, line: bytes):
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise Exception(f"Ollama API error: {chunk['error']}")
+        return chunk.get("message", {}).get("content", ""), chunk.get("done", False)
+    
+    def _parse_ollama_generate_line(self, line: bytes):
+        chunk = json.loads(line)
+        if chunk.get("error"):
+            raise Exception(f"Ollama API error: {chunk['error']}")
+        return chunk.get("response", ""), chunk.get("done", False)
+    
+    def _parse_openai_sse_line(self, line: bytes):
+        if not line.startswith(b"data:"):
+            return "", False
+        data = line[5:].strip()
+        if data == b"[DONE]":
+            return "", True
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content") or "", choices[0].get("finish_reason") is not None
+
     async def check_health(self, model_provider: Optional[str] = None) -> Dict[str, Any]:
         """Check health of the specified model provider."""
         
@@ -152,7 +295,7 @@ class LLMConnector:
     async def _get_ollama_models(self) -> List[str]:
         """Get available Ollama models."""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = await asyncio.to_thread(requests.get, f"{self.ollama_url}/api/tags", timeout=5)
             response.raise_for_status()
             data = response.json()
             return [model["name"] for model in data.get("models", [])]
@@ -162,7 +305,7 @@ class LLMConnector:
     async def _get_lm_studio_models(self) -> List[str]:
         """Get available LM Studio models."""
         try:
-            response = requests.get(f"{self.lm_studio_url}/v1/models", timeout=5)
+            response = await asyncio.to_thread(requests.get, f"{self.lm_studio_url}/v1/models", timeout=5)
             response.raise_for_status()
             data = response.json()
             return [model["id"] for model in data.get("data", [])]
@@ -172,7 +315,7 @@ class LLMConnector:
     async def _check_ollama_health(self) -> Dict[str, Any]:
         """Check Ollama health."""
         try:
-            response = requests.get(f"{self.ollama_url}/api/tags", timeout=5)
+            response = await asyncio.to_thread(requests.get, f"{self.ollama_url}/api/tags", timeout=5)
             response.raise_for_status()
             return {"status": "healthy", "provider": "ollama"}
         except requests.exceptions.RequestException:
@@ -191,7 +334,7 @@ class LLMConnector:
     async def _check_lm_studio_health(self) -> Dict[str, Any]:
         """Check LM Studio health."""
         try:
-            response = requests.get(f"{self.lm_studio_url}/v1/models", timeout=5)
+            response = await asyncio.to_thread(requests.get, f"{self.lm_studio_url}/v1/models", timeout=5)
             response.raise_for_status()
             return {"status": "healthy", "provider": "lmstudio"}
         except requests.exceptions.RequestException:
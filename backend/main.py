@@ -2,20 +2,30 @@
 
 import os
 import json
-from typing import Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, Depends, Request
+import hmac
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Literal, Callable, Awaitable
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, Query, Header, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 
 from config import settings
-from database import get_db, create_tables
-from models import Conversation, Message, UserConfig
+from database import get_db, create_tables, SessionLocal
+from models import Conversation
 from conversation_service import ConversationService, UserConfigService
+from http_cache import http_date, is_not_modified
+from fast_json import FastJSONResponse, text_timestamp
+from profiling import slow_request_log, sampling_profiler, memory_tracker, stage, staged
+from static_assets import StaticAssetServer
+from data_transfer import export_ndjson, import_ndjson_stream
 from llm_connector import llm_connector
-from web_search import web_search_service
+from retention import RetentionService, retention_worker
+from batch import BatchService, batch_runner, stream_results
+from titles import DEFAULT_TITLE, interactive_load, title_queue
 
 
 # Pydantic models for API requests/responses
@@ -23,6 +33,7 @@ class ChatRequest(BaseModel):
     conversationId: Optional[str] = None
     query: str
     webSearchEnabled: bool = False
+    deepSearch: bool = False
     backend: Dict[str, Any]
     model: Optional[str] = None
 
@@ -39,12 +50,40 @@ class ConversationResponse(BaseModel):
     timestamp: str
     preview: str
     messages: list
+    messageCount: int = 0
+    lastMessageAt: Optional[str] = None
+    lastRole: Optional[str] = None
+    tokenEstimate: int = 0
 
 
+# The listing endpoints return FastJSONResponse built from rows; these two
+# models are kept as their response_model so the OpenAPI schema stays documented
 class ConversationsResponse(BaseModel):
     conversations: list[ConversationResponse]
 
 
+class MessagesResponse(BaseModel):
+    conversationId: str
+    messages: list
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    olderThanDays: Optional[int] = Field(None, ge=1)
+
+
+class BatchItemRequest(BaseModel):
+    prompt: str
+    conversationId: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItemRequest]
+    backend: Dict[str, Any] = {}
+    model: Optional[str] = None
+    saveConversations: bool = False
+
+
 class ConfigResponse(BaseModel):
     backend: Dict[str, Any]
     theme: Dict[str, Any]
@@ -75,10 +114,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Long-running tasks started with the app and cancelled on shutdown
+background_tasks: List[asyncio.Task] = []
+
+
 # Create database tables on startup
 @app.on_event("startup")
 async def startup_event():
     create_tables()
+    
+    if settings.ollama_warmup and settings.model_provider == "ollama":
+        background_tasks.append(asyncio.create_task(llm_connector.warm_up()))
+    
+    if RetentionService().enabled:
+        background_tasks.append(asyncio.create_task(retention_worker()))
+    
+    if settings.title_generation_enabled:
+        background_tasks.append(asyncio.create_task(title_queue.run()))
+    
+    # Pick up batch jobs interrupted by the previous shutdown
+    await batch_runner.resume()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await batch_runner.shutdown()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
 
 
 # Health check endpoint
@@ -102,73 +166,146 @@ async def get_models(provider: Optional[str] = None):
 
 
 # Chat endpoint
+# How often an in-flight chat checks whether its client has gone away
+DISCONNECT_POLL_INTERVAL = 0.25
+
+
+async def _cancel_on_disconnect(http_request: Request, coro):
+    """Run `coro`, cancelling it if the client disconnects before it finishes."""
+    task = asyncio.ensure_future(coro)
+    
+    async def watch_disconnect():
+        while not task.done():
+            if await http_request.is_disconnected():
+                task.cancel()
+                return
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if watcher.done() and not watcher.cancelled():
+            # Nobody is listening any more; 499 mirrors nginx's "client closed request"
+            raise HTTPException(status_code=499, detail="Client disconnected")
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+
+def _load_conversation(conversation_service: ConversationService, conversation_id: Optional[str]):
+    """Read the existing conversation and its history (no writes)."""
+    if not conversation_id:
+        return None, []
+    
+    conversation = conversation_service.get_conversation(conversation_id)
+    if not conversation:
+        return None, []
+    
+    return conversation, conversation_service.get_conversation_history(conversation_id)
+
+
+async def _no_models() -> list:
+    return []
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(request: ChatRequest, http_request: Request, db: Session = Depends(get_db)):
     """Process chat messages and return AI responses."""
-    try:
-        # Provider health and model availability pre-check
-        provider = request.backend.get("type", settings.model_provider)
-        backend_health = await llm_connector.check_health(provider)
-        if backend_health.get("status") != "healthy":
-            raise HTTPException(status_code=503, detail=f"{provider} backend not available")
+    return await _cancel_on_disconnect(http_request, _process_chat(request, db))
+
 
-        if request.model:
-            models = await llm_connector.get_available_models(provider)
-            if request.model not in models:
-                raise HTTPException(status_code=400, detail=f"Model '{request.model}' not available for {provider}")
+async def _process_chat(
+    request: ChatRequest,
+    db: Session,
+    on_token: Optional[Callable[[str, str], Awaitable[None]]] = None
+) -> ChatResponse:
+    """Run the chat pipeline as a small task graph.
+    
+    Web search (and its embeddings) starts as soon as the query arrives and
+    overlaps with the provider checks and the history read. Its context is only
+    awaited right before generation. Nothing is written until the provider
+    checks pass. Cancelling the pipeline aborts the upstream generation.
+    """
+    provider = request.backend.get("type", settings.model_provider)
+    trace = slow_request_log.start("chat")
+    search_task = None
+    if request.webSearchEnabled:
+        # Web search is optional; its module (and duckduckgo_search) loads on first use
+        from web_search import get_web_search_service
+        search_task = asyncio.create_task(
+            staged("web_search", get_web_search_service().search_and_embed(request.query, deep=request.deepSearch))
+        )
+    
+    # Background work (title generation) yields while interactive chats are in flight
+    interactive_load.enter()
+    try:
         conversation_service = ConversationService(db)
         
-        # Get or create conversation
-        if request.conversationId:
-            conversation = conversation_service.get_conversation(request.conversationId)
-            if not conversation:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-        else:
-            conversation = conversation_service.create_conversation()
-        
-        # Add user message
-        user_message = conversation_service.add_message(
-            conversation.id,
-            request.query,
-            "user"
+        # Provider health, model availability and the history read are independent
+        backend_health, models, (conversation, history) = await asyncio.gather(
+            staged("health_check", llm_connector.check_health(provider)),
+            staged("model_check", llm_connector.get_available_models(provider)) if request.model else _no_models(),
+            staged("load_history", asyncio.to_thread(_load_conversation, conversation_service, request.conversationId))
         )
         
-        # Get conversation history
-        history = conversation_service.get_conversation_history(conversation.id)
+        if backend_health.get("status") != "healthy":
+            raise HTTPException(status_code=503, detail=f"{provider} backend not available")
         
-        # Prepare prompt with web search context if enabled
-        prompt = request.query
-        if request.webSearchEnabled:
-            search_results = await web_search_service.search_and_embed(request.query)
-            if search_results["context"]:
-                prompt = f"""Based on the following web search results, please answer the user's question:
-
-{search_results["context"]}
-
-User's question: {request.query}
-
-Please provide a comprehensive answer based on the search results and your knowledge."""
+        if request.model and request.model not in models:
+            raise HTTPException(status_code=400, detail=f"Model '{request.model}' not available for {provider}")
         
-        # Generate AI response
-        llm_response = await llm_connector.generate_response(
-            prompt=prompt,
-            conversation_history=history[:-1],  # Exclude the current user message
-            model_provider=provider,
-            model_override=request.model
-        )
+        with stage("save_user_message"):
+            # Get or create conversation
+            if request.conversationId:
+                if not conversation:
+                    raise HTTPException(status_code=404, detail="Conversation not found")
+            else:
+                conversation = conversation_service.create_conversation()
+            
+            # Add user message
+            conversation_service.add_message(
+                conversation.id,
+                request.query,
+                "user"
+            )
+        
+        # Join the web search context just before generation. It is passed as
+        # trailing context so the prompt prefix (system prompt, history, user
+        # question) stays stable across turns
+        context = None
+        if search_task:
+            with stage("await_web_search"):
+                search_results = await search_task
+            context = search_results["context"] or None
         
-        # Extract response content based on provider
-        if request.backend.get("type") == "lmstudio":
-            ai_content = llm_response["choices"][0]["message"]["content"]
-        else:  # ollama
-            ai_content = llm_response["message"]["content"]
+        # Generate AI response, forwarding deltas to streaming clients
+        parts = []
+        with stage("generate"):
+            async for delta in llm_connector.stream_response(
+                prompt=request.query,
+                conversation_history=history,
+                model_provider=provider,
+                model_override=request.model,
+                context=context
+            ):
+                parts.append(delta)
+                if on_token is not None:
+                    await on_token(conversation.id, delta)
+        ai_content = "".join(parts)
         
         # Add AI message to conversation
-        ai_message = conversation_service.add_message(
-            conversation.id,
-            ai_content,
-            "assistant"
-        )
+        with stage("save_reply"):
+            conversation_service.add_message(
+                conversation.id,
+                ai_content,
+                "assistant"
+            )
+        
+        # Name new conversations in the background once the first exchange is stored
+        if not history and conversation.title == DEFAULT_TITLE:
+            title_queue.enqueue(conversation.id, provider, request.model, request.query, ai_content)
         
         return ChatResponse(
             conversationId=conversation.id,
@@ -179,37 +316,241 @@ Please provide a comprehensive answer based on the search results and your knowl
             done=True
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    finally:
+        if search_task and not search_task.done():
+            search_task.cancel()
+        interactive_load.exit()
+        slow_request_log.finish(trace)
+
+
+# WebSocket chat transport
+class _ChatSocket:
+    """One WebSocket connection carrying any number of concurrent chats.
+    
+    Client messages:
+      {"type": "chat", "requestId": ..., <ChatRequest fields>}
+      {"type": "cancel", "requestId": ...}
+    Server messages (all tagged with requestId):
+      token, done, cancelled and error events.
+    """
+    
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.send_lock = asyncio.Lock()
+    
+    async def send(self, message: Dict[str, Any]):
+        # Frames from concurrent chats must not interleave
+        async with self.send_lock:
+            await self.websocket.send_json(message)
+    
+    async def run(self):
+        try:
+            while True:
+                frame = await self.websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                
+                # A malformed frame must not tear down the other chats on this connection
+                message = self.parse(frame.get("text"))
+                if message is None:
+                    await self.send({"type": "error", "requestId": "", "status": 400,
+                                     "detail": "Messages must be JSON objects sent as text frames"})
+                    continue
+                
+                message_type = message.get("type")
+                request_id = str(message.get("requestId", ""))
+                
+                if message_type == "chat":
+                    await self.start_chat(request_id, message)
+                elif message_type == "cancel":
+                    task = self.tasks.get(request_id)
+                    if task:
+                        task.cancel()
+                else:
+                    await self.send({"type": "error", "requestId": request_id, "status": 400,
+                                     "detail": f"Unknown message type: {message_type}"})
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # Nobody is listening any more: abort every in-flight generation
+            for task in self.tasks.values():
+                task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+    
+    @staticmethod
+    def parse(text: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Decode a client frame; None unless it is a JSON object."""
+        try:
+            message = json.loads(text)
+        except (TypeError, ValueError):
+            return None
+        return message if isinstance(message, dict) else None
+    
+    async def start_chat(self, request_id: str, message: Dict[str, Any]):
+        if not request_id or request_id in self.tasks:
+            await self.send({"type": "error", "requestId": request_id, "status": 400,
+                             "detail": "A unique requestId is required"})
+            return
+        if len(self.tasks) >= settings.ws_max_inflight:
+            await self.send({"type": "error", "requestId": request_id, "status": 429,
+                             "detail": "Too many in-flight requests on this connection"})
+            return
+        
+        try:
+            request = ChatRequest(**{k: v for k, v in message.items() if k not in ("type", "requestId")})
+        except ValidationError as e:
+            await self.send({"type": "error", "requestId": request_id, "status": 422, "detail": str(e)})
+            return
+        
+        self.tasks[request_id] = asyncio.create_task(self.chat(request_id, request))
+    
+    async def chat(self, request_id: str, request: ChatRequest):
+        async def on_token(conversation_id: str, delta: str):
+            await self.send({"type": "token", "requestId": request_id,
+                             "conversationId": conversation_id, "content": delta})
+        
+        db = SessionLocal()
+        try:
+            response = await _process_chat(request, db, on_token)
+            await self.send({"type": "done", "requestId": request_id,
+                             "conversationId": response.conversationId, "message": response.message})
+        except asyncio.CancelledError:
+            try:
+                await self.send({"type": "cancelled", "requestId": request_id})
+            except Exception:
+                pass
+        except HTTPException as e:
+            try:
+                await self.send({"type": "error", "requestId": request_id, "status": e.status_code, "detail": e.detail})
+            except Exception:
+                pass
+        finally:
+            db.close()
+            self.tasks.pop(request_id, None)
+
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """Multiplexed, cancellable streaming chat over a single WebSocket."""
+    await websocket.accept()
+    await _ChatSocket(websocket).run()
 
 
 # Conversation management endpoints
+def _conversation_response(conv: Conversation) -> ConversationResponse:
+    """Build a conversation response (without messages) from the conversation row."""
+    return ConversationResponse(
+        id=conv.id,
+        title=conv.title,
+        timestamp=conv.updated_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        preview=conv.preview or "",
+        messages=[],
+        messageCount=conv.message_count or 0,
+        lastMessageAt=conv.last_message_at.strftime("%Y-%m-%dT%H:%M:%SZ") if conv.last_message_at else None,
+        lastRole=conv.last_role,
+        tokenEstimate=conv.token_estimate or 0
+    )
+
+
 @app.get("/api/conversations", response_model=ConversationsResponse)
-async def get_conversations(db: Session = Depends(get_db)):
-    """Get all conversations."""
+async def get_conversations(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    sort: Literal["updated", "lastMessage", "messageCount"] = "updated",
+    minMessages: int = Query(0, ge=0),
+    includeMessages: bool = True,
+    db: Session = Depends(get_db)
+):
+    """Get conversations.
+    
+    Listing, sorting and filtering read only the conversations table; pass
+    includeMessages=false to skip loading message bodies entirely. The body is
+    serialized straight from row tuples (see fast_json) rather than through
+    nested response models.
+    """
+    conversation_service = ConversationService(db)
+    rows = conversation_service.get_conversation_rows(
+        limit=limit,
+        offset=offset,
+        sort=sort,
+        min_messages=minMessages
+    )
+    
+    conversations = []
+    by_id = {}
+    for conv_id, title, preview, updated_at, message_count, last_message_at, last_role, token_estimate in rows:
+        conversation = {
+            "id": conv_id,
+            "title": title,
+            "timestamp": text_timestamp(updated_at),
+            "preview": preview or "",
+            "messages": [],
+            "messageCount": message_count or 0,
+            "lastMessageAt": text_timestamp(last_message_at),
+            "lastRole": last_role,
+            "tokenEstimate": token_estimate or 0
+        }
+        conversations.append(conversation)
+        by_id[conv_id] = conversation["messages"]
+    
+    if includeMessages:
+        for conv_id, msg_id, content, role, created_at in conversation_service.get_message_rows(list(by_id)):
+            by_id[conv_id].append({
+                "id": msg_id,
+                "content": content,
+                "role": role,
+                "timestamp": text_timestamp(created_at)
+            })
+    
+    return FastJSONResponse({"conversations": conversations}, request.headers)
+
+
+@app.get("/api/conversations/{conversation_id}/messages", response_model=MessagesResponse)
+async def get_conversation_messages(
+    request: Request,
+    conversation_id: str,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Get a page of messages for a conversation."""
     conversation_service = ConversationService(db)
-    conversations = conversation_service.get_all_conversations()
-    
-    conversation_list = []
-    for conv in conversations:
-        messages = conversation_service.get_conversation_messages(conv.id)
-        conversation_list.append(ConversationResponse(
-            id=conv.id,
-            title=conv.title,
-            timestamp=conv.updated_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
-            preview=conv.preview or "",
-            messages=[
+    
+    if not conversation_service.get_conversation(conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    rows = conversation_service.get_message_rows([conversation_id], limit=limit, offset=offset)
+    
+    return FastJSONResponse(
+        {
+            "conversationId": conversation_id,
+            "messages": [
                 {
-                    "id": msg.id,
-                    "content": msg.content,
-                    "role": msg.role,
-                    "timestamp": msg.created_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+                    "id": msg_id,
+                    "content": content,
+                    "role": role,
+                    "timestamp": text_timestamp(created_at)
                 }
-                for msg in messages
+                for _, msg_id, content, role, created_at in rows
             ]
-        ))
+        },
+        request.headers
+    )
+
+
+@app.post("/api/conversations/repair-stats")
+async def repair_conversation_stats(db: Session = Depends(get_db)):
+    """Recompute denormalized conversation stats from the messages table."""
+    conversation_service = ConversationService(db)
+    repaired = conversation_service.recompute_stats()
     
-    return ConversationsResponse(conversations=conversation_list)
+    return {"success": True, "repaired": repaired}
 
 
 @app.post("/api/conversations", response_model=ConversationResponse)
@@ -222,13 +563,40 @@ async def create_conversation(
     
     new_conversation = conversation_service.create_conversation(conversation.title)
     
-    return ConversationResponse(
-        id=new_conversation.id,
-        title=new_conversation.title,
-        timestamp=new_conversation.created_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
-        preview=new_conversation.preview or "",
-        messages=[]
-    )
+    return _conversation_response(new_conversation)
+
+
+@app.post("/api/conversations/bulk-delete")
+async def bulk_delete_conversations(
+    request: BulkDeleteRequest,
+    db: Session = Depends(get_db)
+):
+    """Delete conversations by ID list and/or by age, in bounded chunks."""
+    if request.ids is None and request.olderThanDays is None:
+        raise HTTPException(status_code=400, detail="Provide ids and/or olderThanDays")
+    
+    conversation_service = ConversationService(db)
+    deleted = 0
+    
+    # Chunked deletes can take a while on large stores; keep them off the event loop
+    if request.ids:
+        deleted += await asyncio.to_thread(conversation_service.delete_conversations, request.ids)
+    if request.olderThanDays is not None:
+        cutoff = datetime.utcnow() - timedelta(days=request.olderThanDays)
+        deleted += await asyncio.to_thread(conversation_service.delete_conversations_older_than, cutoff)
+    
+    return {"success": True, "deleted": deleted}
+
+
+@app.post("/api/retention/run")
+async def run_retention():
+    """Apply the configured retention policy immediately."""
+    service = RetentionService()
+    if not service.enabled:
+        raise HTTPException(status_code=400, detail="No retention policy configured")
+    
+    result = await asyncio.to_thread(service.purge)
+    return {"success": True, **result}
 
 
 @app.delete("/api/conversations/{conversation_id}")
@@ -246,24 +614,154 @@ async def delete_conversation(
     return {"success": True, "message": "Conversation deleted successfully"}
 
 
+# Bulk export/import endpoints
+@app.get("/api/export")
+async def export_conversations(format: Literal["ndjson", "gzip"] = "ndjson"):
+    """Stream every conversation and message as NDJSON (optionally gzipped)."""
+    compress = format == "gzip"
+    
+    def stream():
+        db = SessionLocal()
+        try:
+            yield from export_ndjson(db, compress=compress)
+        finally:
+            db.close()
+    
+    filename = "bifrost-export.ndjson.gz" if compress else "bifrost-export.ndjson"
+    return StreamingResponse(
+        stream(),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/api/import")
+async def import_conversations(request: Request):
+    """Import conversations from an NDJSON (or gzipped NDJSON) request body."""
+    db = SessionLocal()
+    try:
+        counts = await import_ndjson_stream(db, request.stream())
+    except (ValueError, KeyError) as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Invalid import data: {str(e)}")
+    finally:
+        db.close()
+    
+    return {"success": True, "imported": counts}
+
+
+# Batch job endpoints
+def _batch_job_response(job) -> Dict[str, Any]:
+    return {
+        "jobId": job.id,
+        "status": job.status,
+        "provider": job.provider,
+        "model": job.model,
+        "totalItems": job.total_items,
+        "completedItems": job.completed_items,
+        "failedItems": job.failed_items,
+        "pendingItems": job.total_items - job.completed_items - job.failed_items,
+        "error": job.error,
+        "createdAt": job.created_at.isoformat() + "Z",
+        "updatedAt": job.updated_at.isoformat() + "Z",
+        "finishedAt": job.finished_at.isoformat() + "Z" if job.finished_at else None
+    }
+
+
+@app.post("/api/batch", status_code=202)
+async def submit_batch(request: BatchRequest, db: Session = Depends(get_db)):
+    """Queue independent prompts for background generation; returns the job ID."""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items to process")
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_items} items per batch")
+    
+    provider = request.backend.get("type", settings.model_provider)
+    if provider not in ("ollama", "lmstudio"):
+        raise HTTPException(status_code=400, detail=f"Unsupported model provider: {provider}")
+    
+    try:
+        job = await asyncio.to_thread(
+            BatchService(db).create_job,
+            [{"prompt": item.prompt, "conversation_id": item.conversationId} for item in request.items],
+            provider,
+            request.model,
+            request.saveConversations
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    batch_runner.start(job.id)
+    return _batch_job_response(job)
+
+
+@app.get("/api/batch/{job_id}")
+async def get_batch(job_id: str, db: Session = Depends(get_db)):
+    """Get batch job progress."""
+    job = BatchService(db).get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    
+    return _batch_job_response(job)
+
+
+@app.get("/api/batch/{job_id}/results")
+async def get_batch_results(job_id: str, after: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    """Stream finished items as NDJSON in completion order, following the job until it stops.
+    
+    Each line carries a `seq`; reconnect with `after=<last seq>` to continue.
+    """
+    if not BatchService(db).get_job(job_id):
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    
+    return StreamingResponse(stream_results(job_id, after), media_type="application/x-ndjson")
+
+
+@app.post("/api/batch/{job_id}/cancel")
+async def cancel_batch(job_id: str):
+    """Cancel a queued or running batch job; finished results are kept."""
+    if not await batch_runner.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Batch job not found or already finished")
+    
+    return {"success": True}
+
+
 # Configuration endpoints
 @app.get("/api/config", response_model=ConfigResponse)
-async def get_config(db: Session = Depends(get_db)):
-    """Get user configuration."""
+async def get_config(request: Request, response: Response, db: Session = Depends(get_db)):
+    """Get user configuration.
+    
+    Served from the in-process config cache with ETag/Last-Modified validators;
+    a matching conditional request gets a 304 without touching the database.
+    """
     config_service = UserConfigService(db)
-    config = config_service.get_config()
+    config = config_service.get_config_snapshot()
     
+    validators = {
+        "ETag": config["etag"],
+        "Last-Modified": http_date(config["updated_at"]),
+        "Cache-Control": "no-cache"
+    }
+    if is_not_modified(
+        request.headers.get("if-none-match"),
+        request.headers.get("if-modified-since"),
+        config["etag"],
+        config["updated_at"]
+    ):
+        return Response(status_code=304, headers=validators)
+    
+    response.headers.update(validators)
     return ConfigResponse(
         backend={
-            "type": config.backend_type,
-            "port": config.backend_port
+            "type": config["backend_type"],
+            "port": config["backend_port"]
         },
         theme={
-            "accentColor": config.accent_color
+            "accentColor": config["accent_color"]
         },
-        webSearchEnabled=config.web_search_enabled,
-        userId=config.user_id,
-        lastUpdated=config.updated_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        webSearchEnabled=config["web_search_enabled"],
+        userId=config["user_id"],
+        lastUpdated=config["updated_at"].strftime("%Y-%m-%dT%H:%M:%SZ")
     )
 
 
@@ -303,6 +801,66 @@ async def update_config(
     }
 
 
+# Admin diagnostics endpoints (disabled unless ADMIN_TOKEN is set)
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Gate diagnostics behind the X-Admin-Token header."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.post("/api/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=120),
+    interval: float = Query(0.005, ge=0.001, le=1.0)
+):
+    """Sample all threads for N seconds and return folded stacks for flamegraph tools."""
+    try:
+        return await asyncio.to_thread(sampling_profiler.profile, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/api/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def get_slow_requests():
+    """Get captured slow requests with per-stage timings and SQL."""
+    return {
+        "thresholdMs": slow_request_log.threshold_ms,
+        "requests": list(slow_request_log.entries)
+    }
+
+
+@app.put("/api/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def configure_slow_requests(thresholdMs: Optional[int] = Query(None, ge=0)):
+    """Enable slow-request capture above thresholdMs, or disable it when omitted."""
+    slow_request_log.configure(thresholdMs)
+    return {"success": True, "thresholdMs": slow_request_log.threshold_ms}
+
+
+@app.post("/api/admin/tracemalloc/start", dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = Query(25, ge=1, le=100)):
+    """Start tracing Python memory allocations."""
+    memory_tracker.start(frames)
+    return {"success": True, "tracing": True}
+
+
+@app.get("/api/admin/tracemalloc/snapshot", dependencies=[Depends(require_admin)])
+async def tracemalloc_snapshot(limit: int = Query(25, ge=1, le=500)):
+    """Top allocation sites and growth since the previous snapshot."""
+    try:
+        return await asyncio.to_thread(memory_tracker.snapshot, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.post("/api/admin/tracemalloc/stop", dependencies=[Depends(require_admin)])
+async def stop_tracemalloc():
+    """Stop tracing memory allocations."""
+    memory_tracker.stop()
+    return {"success": True, "tracing": False}
+
+
 # Serve static files (frontend)
 # Check if UI build directory exists
 ui_build_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "UI", "dist")
@@ -310,26 +868,28 @@ if os.path.exists(ui_build_path):
     # Mount static files
     app.mount("/static", StaticFiles(directory=ui_build_path), name="static")
     
+    # Indexed once at startup; requests are served without filesystem stats
+    frontend_assets = StaticAssetServer(ui_build_path)
+    
+    @app.on_event("startup")
+    async def index_frontend_assets():
+        frontend_assets.build_index()
+    
     # Serve the frontend application
     @app.get("/")
-    async def serve_frontend():
+    async def serve_frontend(request: Request):
         """Serve the frontend application."""
-        return FileResponse(os.path.join(ui_build_path, "index.html"))
+        return frontend_assets.index_response(request.headers)
     
     @app.get("/{path:path}")
-    async def serve_frontend_files(path: str):
+    async def serve_frontend_files(path: str, request: Request):
         """Serve frontend files and handle SPA routing."""
         # Skip API routes
         if path.startswith(("api/", "health", "chat", "docs")):
             return {"error": "Not found"}
         
-        # Try to serve the specific file
-        file_path = os.path.join(ui_build_path, path)
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            return FileResponse(file_path)
-        
-        # For SPA routing, serve index.html for all other routes
-        return FileResponse(os.path.join(ui_build_path, "index.html"))
+        # Known files are served directly; everything else gets index.html for SPA routing
+        return frontend_assets.response(path, request.headers)
 else:
     @app.get("/")
     async def root():
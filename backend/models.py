@@ -1,6 +1,6 @@
 """Database models for Bifrost backend."""
 
-from sqlalchemy import Column, String, Text, DateTime, Boolean, Integer, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, Boolean, Integer, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -18,7 +18,13 @@ class Conversation(Base):
     title = Column(String(500), nullable=False)
     preview = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    # Denormalized message stats, maintained by ConversationService.add_message
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime)
+    last_role = Column(String(20))
+    token_estimate = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationship to messages
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
@@ -28,7 +34,12 @@ class Message(Base):
     """Message model for storing individual chat messages."""
     
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves per-conversation lookups and, for time-ordered IDs, history ordering
+        Index("ix_messages_conversation_id_id", "conversation_id", "id"),
+    )
     
+    # Time-ordered IDs (see ids.py); rows from older versions keep UUID4 strings
     id = Column(String(255), primary_key=True)
     conversation_id = Column(String(255), ForeignKey("conversations.id"), nullable=False)
     content = Column(Text, nullable=False)
@@ -51,3 +62,51 @@ class UserConfig(Base):
     web_search_enabled = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class BatchJob(Base):
+    """Batch inference job submitted through /api/batch."""
+    
+    __tablename__ = "batch_jobs"
+    
+    id = Column(String(255), primary_key=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, completed, cancelled, failed
+    provider = Column(String(20), nullable=False)
+    model = Column(String(255))
+    save_conversations = Column(Boolean, nullable=False, default=False)
+    total_items = Column(Integer, nullable=False, default=0)
+    completed_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    # Relationship to items
+    items = relationship("BatchItem", back_populates="job", cascade="all, delete-orphan")
+
+
+class BatchItem(Base):
+    """Single prompt of a batch job and its result."""
+    
+    __tablename__ = "batch_items"
+    __table_args__ = (
+        # Pending-item scans when a job starts or resumes
+        Index("ix_batch_items_job_id_status_id", "job_id", "status", "id"),
+        # Streaming results back in completion order
+        Index("ix_batch_items_job_id_result_seq", "job_id", "result_seq"),
+    )
+    
+    id = Column(String(255), primary_key=True)
+    job_id = Column(String(255), ForeignKey("batch_jobs.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    prompt = Column(Text, nullable=False)
+    conversation_id = Column(String(255))  # History source and, when saving, destination
+    status = Column(String(20), nullable=False, default="pending")  # 'pending', 'done' or 'error'
+    response = Column(Text)
+    error = Column(Text)
+    result_seq = Column(Integer)  # Completion order within the job
+    completed_at = Column(DateTime)
+    
+    # Relationship to job
+    job = relationship("BatchJob", back_populates="items")
@@ -0,0 +1,159 @@
+"""Main-text extraction, chunking and lexical ranking for fetched web pages.
+
+Only the standard library is used, and extract_chunks() is a plain
+module-level function so it can run on a process pool.
+"""
+
+import math
+import re
+from collections import Counter
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+# Elements whose content is never part of the main text
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "head",
+    "nav", "footer", "header", "aside", "form", "button", "select",
+}
+
+# Elements that end the current text block
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "li", "ul", "ol", "table", "tr", "td", "th",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt", "figcaption", "br", "hr",
+}
+
+# Elements that usually wrap the main content when a page has them
+MAIN_TAGS = {"article", "main"}
+
+# Text inside MAIN_TAGS is used on its own once it is at least this long
+MIN_MAIN_CHARS = 500
+
+# Blocks with fewer words are treated as navigation/boilerplate
+MIN_BLOCK_WORDS = 5
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+    "who", "why", "with",
+}
+
+WORD = re.compile(r"\w+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text as blocks, remembering which were inside <article>/<main>."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[Tuple[bool, str]] = []
+        self._current: List[str] = []
+        self._skip_depth = 0
+        self._main_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag in BLOCK_TAGS:
+            self.end_block()
+        if tag in MAIN_TAGS:
+            self._main_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.end_block()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if tag in BLOCK_TAGS:
+            self.end_block()
+        if tag in MAIN_TAGS:
+            self._main_depth = max(0, self._main_depth - 1)
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._current.append(data)
+
+    def end_block(self):
+        text = " ".join("".join(self._current).split())
+        if text:
+            self.blocks.append((self._main_depth > 0, text))
+        self._current = []
+
+
+def extract_text(html: str) -> str:
+    """Extract the main readable text of an HTML page, one block per line."""
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    parser.end_block()
+
+    blocks = [(in_main, text) for in_main, text in parser.blocks if len(text.split()) >= MIN_BLOCK_WORDS]
+    main = [text for in_main, text in blocks if in_main]
+    if sum(len(text) for text in main) >= MIN_MAIN_CHARS:
+        return "\n".join(main)
+    return "\n".join(text for _, text in blocks)
+
+
+def chunk_text(text: str, size: int) -> List[str]:
+    """Pack lines into chunks of at most `size` characters, splitting long lines at spaces."""
+    pieces = []
+    for line in text.split("\n"):
+        while len(line) > size:
+            cut = line.rfind(" ", 0, size)
+            if cut <= 0:
+                cut = size
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        if line:
+            pieces.append(line)
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > size:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def extract_chunks(html: str, chunk_size: int, max_chunks: int) -> List[str]:
+    """Extract and chunk a page (the unit of work sent to the worker pool)."""
+    return chunk_text(extract_text(html), chunk_size)[:max_chunks]
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def rank_chunks(query: str, chunks: List[str], limit: int, k1: float = 1.2, b: float = 0.75) -> List[Tuple[int, float]]:
+    """Score chunks against the query with BM25; returns the best (index, score) pairs."""
+    terms = set(tokenize(query))
+    if not terms or not chunks:
+        return []
+
+    counts = [Counter(tokenize(chunk)) for chunk in chunks]
+    lengths = [sum(count.values()) for count in counts]
+    average_length = (sum(lengths) / len(lengths)) or 1.0
+    document_frequency = {term: sum(1 for count in counts if term in count) for term in terms}
+
+    scored = []
+    for index, (count, length) in enumerate(zip(counts, lengths)):
+        score = 0.0
+        for term in terms:
+            frequency = count.get(term)
+            if not frequency:
+                continue
+            idf = math.log(1 + (len(chunks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / average_length))
+        if score > 0:
+            scored.append((index, score))
+
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
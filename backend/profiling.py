@@ -0,0 +1,243 @@
+"""On-demand diagnostics: sampling profiler, slow-request capture and tracemalloc.
+
+Everything here is off by default and costs (close to) nothing while off:
+stage() is a context-variable lookup returning a shared no-op context manager,
+and SQL statement capture only hooks into the engine while the slow-request
+log is enabled.
+"""
+
+import contextvars
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import event
+from config import settings
+from database import engine
+
+# Statements kept per captured request
+MAX_TRACE_STATEMENTS = 50
+
+
+class RequestTrace:
+    """Per-stage timings and SQL statements for one request."""
+
+    __slots__ = ("name", "started", "started_at", "stages", "statements")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = datetime.utcnow()
+        self.stages: List[Dict[str, Any]] = []
+        self.statements: List[Dict[str, Any]] = []
+
+
+class _Stage:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: RequestTrace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        self.trace.stages.append({
+            "stage": self.name,
+            "offsetMs": round((self.start - self.trace.started) * 1000, 2),
+            "durationMs": round((end - self.start) * 1000, 2),
+        })
+        return False
+
+
+_current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar("request_trace", default=None)
+_NO_STAGE = nullcontext()
+
+
+def stage(name: str):
+    """Time a pipeline stage of the current traced request (no-op when untraced)."""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_STAGE
+    return _Stage(trace, name)
+
+
+def staged(name: str, awaitable):
+    """Wrap an awaitable so it is timed as a stage (returned unchanged when untraced)."""
+    if _current_trace.get() is None:
+        return awaitable
+
+    async def run():
+        with stage(name):
+            return await awaitable
+
+    return run()
+
+
+class SlowRequestLog:
+    """Keeps the stage breakdown and SQL of requests slower than a threshold."""
+
+    def __init__(self, threshold_ms: Optional[int] = None, max_entries: int = 100):
+        self.threshold_ms = None
+        self.entries: deque = deque(maxlen=max_entries)
+        self._listening = False
+        self.configure(threshold_ms)
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None
+
+    def configure(self, threshold_ms: Optional[int]):
+        """Enable (threshold in ms) or disable (None) capture at runtime."""
+        self.threshold_ms = threshold_ms
+        if self.enabled and not self._listening:
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            self._listening = True
+        elif not self.enabled and self._listening:
+            event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+            self._listening = False
+
+    def start(self, name: str):
+        """Begin tracing the current request; returns a token for finish()."""
+        if not self.enabled:
+            return None
+        trace = RequestTrace(name)
+        return trace, _current_trace.set(trace)
+
+    def finish(self, token):
+        """Stop tracing and record the request if it was slow."""
+        if token is None:
+            return
+        trace, context_token = token
+        _current_trace.reset(context_token)
+
+        elapsed_ms = (time.perf_counter() - trace.started) * 1000
+        if self.threshold_ms is None or elapsed_ms < self.threshold_ms:
+            return
+
+        self.entries.append({
+            "request": trace.name,
+            "startedAt": trace.started_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "durationMs": round(elapsed_ms, 2),
+            "stages": trace.stages,
+            "sql": trace.statements,
+        })
+        breakdown = ", ".join(f"{s['stage']}={s['durationMs']:.0f}ms" for s in trace.stages)
+        print(f"Slow request {trace.name}: {elapsed_ms:.0f} ms ({breakdown})")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_trace.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    starts = conn.info.get("query_start")
+    if trace is None or not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    if len(trace.statements) < MAX_TRACE_STATEMENTS:
+        trace.statements.append({"sql": statement, "durationMs": round(duration_ms, 3)})
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler across all threads.
+
+    Produces folded stacks ("frame;frame;frame count" per line), the input
+    format of flamegraph.pl, speedscope and similar tools.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def profile(self, seconds: float, interval: float = 0.005) -> str:
+        """Sample every thread for `seconds`; blocks the calling thread."""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profiling session is already running")
+
+        try:
+            me = threading.get_ident()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks: Counter = Counter()
+            deadline = time.perf_counter() + seconds
+
+            while time.perf_counter() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == me:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        frames.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    frames.append(names.get(thread_id, f"thread-{thread_id}"))
+                    stacks[";".join(reversed(frames))] += 1
+                time.sleep(interval)
+
+            return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+
+class MemoryTracker:
+    """Thin wrapper around tracemalloc with snapshot diffs."""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 25):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(self, limit: int = 25) -> Dict[str, Any]:
+        """Top allocation sites, and growth since the previous snapshot."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+
+        result = {
+            "currentBytes": current,
+            "peakBytes": peak,
+            "top": [
+                {"location": str(stat.traceback), "sizeBytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:limit]
+            ],
+        }
+        if self._previous is not None:
+            result["growth"] = [
+                {"location": str(stat.traceback), "sizeDiffBytes": stat.size_diff, "countDiff": stat.count_diff}
+                for stat in snapshot.compare_to(self._previous, "lineno")[:limit]
+            ]
+
+        self._previous = snapshot
+        return result
+
+
+# Global diagnostics instances
+slow_request_log = SlowRequestLog(settings.slow_request_threshold_ms)
+sampling_profiler = SamplingProfiler()
+memory_tracker = MemoryTracker()
@@ -0,0 +1,83 @@
+"""Retention policy enforcement for stored conversations."""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from config import settings
+from conversation_service import ConversationService
+from database import SessionLocal, ensure_incremental_vacuum, incremental_vacuum, reclaim_free_pages
+
+
+class RetentionService:
+    """Purges conversations that fall outside the configured retention policy."""
+
+    def __init__(
+        self,
+        max_age_days: Optional[int] = None,
+        max_conversations: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        vacuum_pages: Optional[int] = None
+    ):
+        self.max_age_days = max_age_days if max_age_days is not None else settings.retention_max_age_days
+        self.max_conversations = (
+            max_conversations if max_conversations is not None else settings.retention_max_conversations
+        )
+        self.chunk_size = chunk_size or settings.purge_chunk_size
+        self.vacuum_pages = vacuum_pages or settings.vacuum_pages_per_chunk
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age_days is not None or self.max_conversations is not None
+
+    def purge(self) -> Dict[str, int]:
+        """Apply the policy once, reclaiming file space after every chunk."""
+        result = {"expired": 0, "overflow": 0}
+        if not self.enabled:
+            return result
+
+        db = SessionLocal()
+        try:
+            conversation_service = ConversationService(db)
+
+            if self.max_age_days is not None:
+                cutoff = datetime.utcnow() - timedelta(days=self.max_age_days)
+                result["expired"] = conversation_service.delete_conversations_older_than(
+                    cutoff, self.chunk_size, self._after_chunk
+                )
+
+            if self.max_conversations is not None:
+                result["overflow"] = conversation_service.delete_conversations_beyond(
+                    self.max_conversations, self.chunk_size, self._after_chunk
+                )
+        finally:
+            db.close()
+
+        # Chunks only release a bounded number of pages each; return the rest now
+        if result["expired"] or result["overflow"]:
+            reclaim_free_pages(self.vacuum_pages)
+
+        return result
+
+    def _after_chunk(self, deleted: int):
+        """Shrink the file a little between chunks instead of one long VACUUM."""
+        if deleted:
+            incremental_vacuum(self.vacuum_pages)
+
+
+async def retention_worker(interval_seconds: Optional[int] = None):
+    """Background loop that enforces the retention policy periodically."""
+    service = RetentionService()
+    interval = interval_seconds or settings.retention_interval_seconds
+
+    # One-off conversion so deleted pages can be released incrementally later
+    await asyncio.to_thread(ensure_incremental_vacuum, True)
+
+    while True:
+        try:
+            result = await asyncio.to_thread(service.purge)
+            if result["expired"] or result["overflow"]:
+                print(f"Retention purge removed {result['expired']} expired and {result['overflow']} overflow conversations")
+        except Exception as e:
+            print(f"Retention purge error: {e}")
+
+        await asyncio.sleep(interval)
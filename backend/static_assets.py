@@ -0,0 +1,157 @@
+"""In-memory indexed server for the built frontend (UI/dist)."""
+
+import gzip
+import mimetypes
+import os
+import re
+from typing import Dict, Any, Optional, Mapping
+from fastapi.responses import FileResponse, Response
+from http_cache import etag_matches, accepted_encodings
+
+# Vite emits content-hashed names such as assets/index-4f3a9c1b.js
+HASHED_ASSET_DIR = "assets/"
+HASHED_ASSET = re.compile(r"[.-][0-9A-Za-z_-]{8,}\.[0-9A-Za-z]+$")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Precompressed variants, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Distinct validator per content-coding; each one is its own representation (RFC 9110)."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+class StaticAssetServer:
+    """Serves a static build from an index built once at startup.
+
+    Every file under the root is stat-ed a single time; requests are then
+    answered with a dict lookup and no filesystem metadata calls. Precompressed
+    .br/.gz siblings are served when the client accepts them, hashed assets get
+    long-lived immutable caching, and index.html is held in memory.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.assets: Dict[str, Dict[str, Any]] = {}
+        self.index: Optional[Dict[str, Any]] = None
+
+    def build_index(self):
+        """Walk the build directory and index every servable file."""
+        assets = {}
+        compressed = {}
+
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                rel_path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+
+                encoding = next((name for name, suffix in ENCODINGS if filename.endswith(suffix)), None)
+                if encoding:
+                    compressed[rel_path] = (encoding, full_path, os.stat(full_path))
+                    continue
+
+                stat_result = os.stat(full_path)
+                media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                immutable = rel_path.startswith(HASHED_ASSET_DIR) and HASHED_ASSET.search(filename)
+                assets[rel_path] = {
+                    "path": full_path,
+                    "stat": stat_result,
+                    "media_type": media_type,
+                    "etag": f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"',
+                    "cache_control": IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE,
+                    "variants": {},
+                }
+
+        # Attach precompressed siblings to the file they were produced from
+        for rel_path, (encoding, full_path, stat_result) in compressed.items():
+            base = rel_path.rsplit(".", 1)[0]
+            if base in assets:
+                assets[base]["variants"][encoding] = (full_path, stat_result)
+            else:
+                # A lone .gz/.br file is served as-is
+                assets[rel_path] = {
+                    "path": full_path,
+                    "stat": stat_result,
+                    "media_type": mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                    "etag": f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"',
+                    "cache_control": REVALIDATE_CACHE,
+                    "variants": {},
+                }
+
+        self.assets = assets
+        self.index = self._load_index(assets.get("index.html"))
+
+    def _load_index(self, asset: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Read index.html (and compressed forms of it) into memory."""
+        if asset is None:
+            return None
+
+        with open(asset["path"], "rb") as f:
+            body = f.read()
+
+        bodies = {"identity": body}
+        for encoding, (path, _) in asset["variants"].items():
+            with open(path, "rb") as f:
+                bodies[encoding] = f.read()
+        if "gzip" not in bodies:
+            bodies["gzip"] = gzip.compress(body, 9)
+
+        return {"bodies": bodies, "etag": asset["etag"]}
+
+    def response(self, path: str, request_headers: Mapping[str, str]) -> Response:
+        """Serve `path`, falling back to index.html for SPA routes."""
+        asset = self.assets.get(path)
+        if asset is None or path == "index.html":
+            return self.index_response(request_headers)
+
+        file_path, stat_result = asset["path"], asset["stat"]
+        headers = {
+            "ETag": asset["etag"],
+            "Cache-Control": asset["cache_control"],
+            "Vary": "Accept-Encoding",
+        }
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        for encoding, _ in ENCODINGS:
+            if encoding in asset["variants"] and encoding in accepted:
+                file_path, stat_result = asset["variants"][encoding]
+                headers["Content-Encoding"] = encoding
+                headers["ETag"] = encoded_etag(asset["etag"], encoding)
+                break
+
+        if etag_matches(request_headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        return FileResponse(
+            file_path,
+            stat_result=stat_result,
+            media_type=asset["media_type"],
+            headers=headers
+        )
+
+    def index_response(self, request_headers: Mapping[str, str]) -> Response:
+        """Serve the in-memory index.html."""
+        if self.index is None:
+            return Response(status_code=404, content="index.html not found")
+
+        headers = {
+            "ETag": self.index["etag"],
+            "Cache-Control": REVALIDATE_CACHE,
+            "Vary": "Accept-Encoding",
+        }
+        bodies = self.index["bodies"]
+        accepted = accepted_encodings(request_headers.get("accept-encoding"))
+        body = bodies["identity"]
+        for encoding, _ in ENCODINGS:
+            if encoding in bodies and encoding in accepted:
+                body = bodies[encoding]
+                headers["Content-Encoding"] = encoding
+                headers["ETag"] = encoded_etag(self.index["etag"], encoding)
+                break
+
+        if etag_matches(request_headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="text/html", headers=headers)
@@ -0,0 +1,214 @@
+"""Background conversation title generation.
+
+Titles are generated after a conversation's first exchange by a single
+low-priority worker. It only calls the backend while no interactive chat is
+in flight, gives the backend back (cancelling its request) as soon as one
+starts, groups queued conversations into one prompt when a backlog builds up
+and drops work when the server stays busy or the queue is full.
+"""
+
+import asyncio
+import re
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional, Tuple
+from config import settings
+from conversation_service import ConversationService
+from database import SessionLocal
+from llm_connector import llm_connector
+
+DEFAULT_TITLE = "New Conversation"
+
+# Longest title stored
+TITLE_MAX_CHARS = 80
+
+# Characters of the opening exchange included in the prompt
+EXCERPT_CHARS = 500
+
+# A job preempted by interactive traffic this many times is dropped
+MAX_ATTEMPTS = 3
+
+NUMBERED_LINE = re.compile(r"^\s*(\d+)\s*[.):-]\s*(.+)$")
+
+
+class InteractiveLoad:
+    """Counts in-flight interactive chats so background work can yield to them."""
+
+    def __init__(self):
+        self.active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._busy = asyncio.Event()
+
+    def enter(self):
+        self.active += 1
+        self._idle.clear()
+        self._busy.set()
+
+    def exit(self):
+        self.active -= 1
+        if self.active <= 0:
+            self.active = 0
+            self._busy.clear()
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait until no chat is in flight; False if that didn't happen within `timeout`."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait_busy(self):
+        await self._busy.wait()
+
+
+def clean_title(text: str) -> str:
+    """Normalize a generated title (first line, no quotes, prefix or trailing period)."""
+    line = next((line for line in text.strip().splitlines() if line.strip()), "")
+    line = re.sub(r"^(title\s*:\s*)", "", line.strip(), flags=re.IGNORECASE)
+    line = line.strip(" \"'`*#").rstrip(".")
+    return line[:TITLE_MAX_CHARS].strip()
+
+
+def _excerpt(text: str) -> str:
+    return text[:EXCERPT_CHARS] + "..." if len(text) > EXCERPT_CHARS else text
+
+
+class TitleQueue:
+    """Low-priority queue that names conversations after their first exchange."""
+
+    def __init__(self, max_size: Optional[int] = None, batch_size: Optional[int] = None):
+        self.max_size = max_size or settings.title_queue_size
+        self.batch_size = batch_size or settings.title_batch_size
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+
+    def enqueue(self, conversation_id: str, provider: str, model: Optional[str], query: str, reply: str) -> bool:
+        """Queue a title job; returns False when it was skipped."""
+        if not settings.title_generation_enabled or len(self._pending) >= self.max_size:
+            return False
+
+        self._pending.append({
+            "conversation_id": conversation_id,
+            "provider": provider,
+            # Defaults to the chat's own model so the backend doesn't have to swap models
+            "model": settings.title_model or model,
+            "query": _excerpt(query),
+            "reply": _excerpt(reply),
+            "attempts": 0,
+        })
+        self._wakeup.set()
+        return True
+
+    async def run(self):
+        """Worker loop; runs for the lifetime of the app."""
+        while True:
+            await self._wakeup.wait()
+            if not self._pending:
+                self._wakeup.clear()
+                continue
+
+            if not await interactive_load.wait_idle(settings.title_max_wait_seconds):
+                print(f"Skipping {len(self._pending)} title job(s): chat traffic is saturating the backend")
+                self._pending.clear()
+                continue
+
+            batch = self._take_batch()
+            generation = asyncio.create_task(self._generate(batch))
+            preempt = asyncio.create_task(interactive_load.wait_busy())
+            try:
+                await asyncio.wait({generation, preempt}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                preempt.cancel()
+
+            if not generation.done():
+                # A chat started: drop the upstream request and retry once idle again
+                generation.cancel()
+                await asyncio.gather(generation, return_exceptions=True)
+                self._requeue(batch)
+                continue
+
+            try:
+                titles = generation.result()
+                await asyncio.to_thread(self._save, titles)
+            except Exception as e:
+                print(f"Title generation error: {e}")
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        """Take up to batch_size queued jobs that share a provider and model."""
+        batch = [self._pending.popleft()]
+        key = (batch[0]["provider"], batch[0]["model"])
+        while self._pending and len(batch) < self.batch_size:
+            if (self._pending[0]["provider"], self._pending[0]["model"]) != key:
+                break
+            batch.append(self._pending.popleft())
+        return batch
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        for job in reversed(batch):
+            job["attempts"] += 1
+            if job["attempts"] < MAX_ATTEMPTS:
+                self._pending.appendleft(job)
+
+    async def _generate(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+        """Generate titles for a batch with a single backend request."""
+        if len(batch) == 1:
+            job = batch[0]
+            prompt = (
+                "Write a short title (at most 6 words) for a conversation that starts with the "
+                "exchange below. Reply with the title only.\n\n"
+                f"User: {job['query']}\nAssistant: {job['reply']}"
+            )
+        else:
+            exchanges = "\n\n".join(
+                f"{i}.\nUser: {job['query']}\nAssistant: {job['reply']}" for i, job in enumerate(batch, 1)
+            )
+            prompt = (
+                "Write a short title (at most 6 words) for each conversation below, based on its "
+                "opening exchange. Reply with one line per conversation in the form "
+                "'<number>. <title>' and nothing else.\n\n" + exchanges
+            )
+
+        parts = []
+        async for delta in llm_connector.stream_response(
+            prompt=prompt,
+            model_provider=batch[0]["provider"],
+            model_override=batch[0]["model"]
+        ):
+            parts.append(delta)
+        text = "".join(parts)
+
+        if len(batch) == 1:
+            title = clean_title(text)
+            return [(batch[0]["conversation_id"], title)] if title else []
+
+        titles = []
+        for line in text.splitlines():
+            match = NUMBERED_LINE.match(line)
+            if not match or not 1 <= int(match.group(1)) <= len(batch):
+                continue
+            title = clean_title(match.group(2))
+            if title:
+                titles.append((batch[int(match.group(1)) - 1]["conversation_id"], title))
+        return titles
+
+    def _save(self, titles: List[Tuple[str, str]]):
+        """Store titles, leaving conversations that were renamed meanwhile alone."""
+        if not titles:
+            return
+
+        db = SessionLocal()
+        try:
+            conversation_service = ConversationService(db)
+            for conversation_id, title in titles:
+                conversation = conversation_service.get_conversation(conversation_id)
+                if conversation and conversation.title == DEFAULT_TITLE:
+                    conversation_service.update_conversation_title(conversation_id, title)
+        finally:
+            db.close()
+
+
+# Global instances shared by the chat endpoints and the background worker
+interactive_load = InteractiveLoad()
+title_queue = TitleQueue()
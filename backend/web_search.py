@@ -1,10 +1,194 @@
 """Web search integration using DuckDuckGo and embeddings."""
 
 import asyncio
-from typing import List, Dict, Any
-from duckduckgo_search import DDGS
+import multiprocessing
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 from config import settings
+from page_text import extract_chunks, rank_chunks
+
+# Connect timeout for page fetches; the read timeout comes from settings
+FETCH_CONNECT_TIMEOUT = 3.05
+
+FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; Bifrost/1.0)",
+    "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9",
+}
+
+# Chunks kept per page before ranking
+MAX_CHUNKS_PER_PAGE = 200
+
+
+def _drop_connection(response: requests.Response):
+    """Shut down a streaming response's socket so a blocked read returns."""
+    try:
+        # Via the file descriptor: for non-keep-alive responses the connection
+        # object no longer holds the socket. shutdown() on a duplicate
+        # descriptor still ends the underlying connection.
+        sock = socket.fromfd(response.raw.fileno(), socket.AF_INET, socket.SOCK_STREAM)
+    except (OSError, ValueError, AttributeError):
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+class PageFetcher:
+    """Fetches result pages for deep search.
+    
+    Requests share one pooled session and run in worker threads, limited per
+    host. Bodies are capped at deep_search_max_bytes. Text extraction runs on
+    a small process pool. Extracted chunks are cached by URL and revalidated
+    with If-None-Match / If-Modified-Since once they are older than the TTL.
+    """
+    
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=settings.deep_search_per_host * 4)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(FETCH_HEADERS)
+        self.cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    async def fetch_chunks(self, url: str) -> List[str]:
+        """Text chunks of the page at `url` (empty when it can't be fetched)."""
+        if urlsplit(url).scheme not in ("http", "https"):
+            return []
+        
+        cached = self.cache.get(url)
+        if cached and time.monotonic() - cached["checked_at"] < settings.deep_search_cache_ttl_seconds:
+            self.cache.move_to_end(url)
+            return cached["chunks"]
+        
+        try:
+            async with self._host_limit(urlsplit(url).hostname or ""):
+                status, html, validators = await asyncio.to_thread(self._get, url, cached)
+            
+            if status == 304 and cached:
+                cached["checked_at"] = time.monotonic()
+                self.cache.move_to_end(url)
+                return cached["chunks"]
+            if html is None:
+                return []
+            
+            chunks = await self._extract(html)
+        except Exception as e:
+            print(f"Page fetch error for {url}: {e}")
+            return []
+        
+        self._store(url, chunks, validators)
+        return chunks
+    
+    def _get(self, url: str, cached: Optional[Dict[str, Any]]) -> Tuple[int, Optional[str], Dict[str, Optional[str]]]:
+        """Blocking conditional GET with a byte cap and a whole-page deadline.
+        
+        Returns (status, text, validators); a page cut off by the deadline comes
+        back without validators.
+        """
+        headers = {}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        
+        deadline = time.monotonic() + settings.deep_search_timeout_seconds
+        with self.session.get(
+            url,
+            headers=headers,
+            stream=True,
+            timeout=(FETCH_CONNECT_TIMEOUT, settings.deep_search_timeout_seconds)
+        ) as response:
+            if response.status_code != 200:
+                return response.status_code, None, {}
+            
+            content_type = response.headers.get("Content-Type", "")
+            if "html" not in content_type and "text/plain" not in content_type:
+                return response.status_code, None, {}
+            
+            # The read timeout applies per socket read, so a slow sender could keep
+            # this thread busy far past the budget: stop reading at the deadline,
+            # and drop the connection then in case a read is still blocked
+            watchdog = threading.Timer(max(0.0, deadline - time.monotonic()), _drop_connection, (response,))
+            watchdog.daemon = True
+            watchdog.start()
+            body = bytearray()
+            timed_out = False
+            try:
+                for block in response.iter_content(chunk_size=4096):
+                    body += block
+                    if len(body) >= settings.deep_search_max_bytes:
+                        break
+                    if time.monotonic() >= deadline:
+                        timed_out = True
+                        break
+            except (requests.exceptions.RequestException, OSError):
+                if time.monotonic() < deadline:
+                    raise
+                timed_out = True
+            finally:
+                watchdog.cancel()
+            if time.monotonic() >= deadline:
+                timed_out = True
+            
+            # requests assumes ISO-8859-1 for text/* without a charset; UTF-8 is the better guess
+            encoding = response.encoding if "charset" in content_type.lower() else "utf-8"
+            try:
+                text = bytes(body[:settings.deep_search_max_bytes]).decode(encoding or "utf-8", errors="replace")
+            except LookupError:
+                text = bytes(body[:settings.deep_search_max_bytes]).decode("utf-8", errors="replace")
+            
+            if timed_out:
+                # Partial page: usable now, but not revalidated as if it were complete
+                return 200, text, {}
+            
+            return 200, text, {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            }
+    
+    async def _extract(self, html: str) -> List[str]:
+        """Extract and chunk page text off the event loop."""
+        args = (html, settings.deep_search_chunk_chars, MAX_CHUNKS_PER_PAGE)
+        if settings.deep_search_workers <= 0:
+            return await asyncio.to_thread(extract_chunks, *args)
+        
+        if self._pool is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=settings.deep_search_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._pool, extract_chunks, *args)
+    
+    def _store(self, url: str, chunks: List[str], validators: Dict[str, Optional[str]]):
+        self.cache[url] = {
+            "chunks": chunks,
+            "etag": validators.get("etag"),
+            "last_modified": validators.get("last_modified"),
+            "checked_at": time.monotonic(),
+        }
+        self.cache.move_to_end(url)
+        while len(self.cache) > settings.deep_search_cache_size:
+            self.cache.popitem(last=False)
+    
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(settings.deep_search_per_host)
+        return limit
 
 
 class WebSearchService:
@@ -13,24 +197,33 @@ class WebSearchService:
     def __init__(self):
         self.max_results = settings.max_search_results
         self.ollama_url = f"http://localhost:{settings.ollama_port}"
+        self.page_fetcher = PageFetcher()
     
     async def search(self, query: str) -> List[Dict[str, Any]]:
         """Search the web for the given query."""
         try:
-            with DDGS() as ddgs:
-                results = []
-                for result in ddgs.text(query, max_results=self.max_results):
-                    results.append({
-                        "title": result.get("title", ""),
-                        "body": result.get("body", ""),
-                        "href": result.get("href", ""),
-                        "snippet": result.get("body", "")[:200] + "..." if len(result.get("body", "")) > 200 else result.get("body", "")
-                    })
-                return results
+            # DDGS is blocking; run it in a worker thread so other requests keep flowing
+            return await asyncio.to_thread(self._search_sync, query)
         except Exception as e:
             print(f"Web search error: {e}")
             return []
     
+    def _search_sync(self, query: str) -> List[Dict[str, Any]]:
+        """Run the DuckDuckGo text search."""
+        # Imported on first use: duckduckgo_search pulls in a large dependency tree
+        from duckduckgo_search import DDGS
+        
+        with DDGS() as ddgs:
+            results = []
+            for result in ddgs.text(query, max_results=self.max_results):
+                results.append({
+                    "title": result.get("title", ""),
+                    "body": result.get("body", ""),
+                    "href": result.get("href", ""),
+                    "snippet": result.get("body", "")[:200] + "..." if len(result.get("body", "")) > 200 else result.get("body", "")
+                })
+            return results
+    
     async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Get embeddings for texts using Ollama's embedding model."""
         try:
@@ -40,7 +233,8 @@ class WebSearchService:
                 "prompt": texts
             }
             
-            response = requests.post(
+            response = await asyncio.to_thread(
+                requests.post,
                 f"{self.ollama_url}/api/embeddings",
                 json=payload,
                 timeout=30
@@ -53,8 +247,40 @@ class WebSearchService:
             print(f"Embedding error: {e}")
             return []
     
-    async def search_and_embed(self, query: str) -> Dict[str, Any]:
-        """Search the web and get embeddings for the results."""
+    async def deep_search(self, query: str, results: List[Dict[str, Any]]):
+        """Fetch the top result pages and attach the chunks most relevant to the query.
+        
+        Pages that don't arrive within deep_search_timeout_seconds are skipped;
+        their results keep the search snippet.
+        """
+        top = results[:settings.deep_search_pages]
+        tasks = [asyncio.create_task(self.page_fetcher.fetch_chunks(result["href"])) for result in top]
+        try:
+            await asyncio.wait(tasks, timeout=settings.deep_search_timeout_seconds)
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        candidates = []
+        for result_index, task in enumerate(tasks):
+            if task.done() and not task.cancelled() and task.exception() is None:
+                candidates.extend((result_index, chunk) for chunk in task.result())
+        if not candidates:
+            return
+        
+        ranked = await asyncio.to_thread(
+            rank_chunks, query, [chunk for _, chunk in candidates], settings.deep_search_max_chunks
+        )
+        for chunk_index, _ in ranked:
+            result_index, chunk = candidates[chunk_index]
+            top[result_index].setdefault("excerpts", []).append(chunk)
+    
+    async def search_and_embed(self, query: str, deep: bool = False) -> Dict[str, Any]:
+        """Search the web and get embeddings for the results.
+        
+        With `deep`, the top result pages are fetched and their most relevant
+        passages replace the short snippets in the context.
+        """
         # Perform web search
         search_results = await self.search(query)
         
@@ -66,6 +292,9 @@ class WebSearchService:
                 "context": ""
             }
         
+        if deep:
+            await self.deep_search(query, search_results)
+        
         # Extract text snippets for embedding
         texts = [result["snippet"] for result in search_results]
         
@@ -86,14 +315,23 @@ class WebSearchService:
         """Create context string from search results."""
         context_parts = []
         for i, result in enumerate(results, 1):
+            content = "\n".join(result["excerpts"]) if result.get("excerpts") else result["snippet"]
             context_parts.append(
                 f"[{i}] {result['title']}\n"
                 f"URL: {result['href']}\n"
-                f"Content: {result['snippet']}\n"
+                f"Content: {content}\n"
             )
         
         return "\n".join(context_parts)
 
 
-# Global web search service instance
-web_search_service = WebSearchService()
+# Global web search service instance, created on first use
+_web_search_service: Optional[WebSearchService] = None
+
+
+def get_web_search_service() -> WebSearchService:
+    """Get the shared web search service, creating it on first use."""
+    global _web_search_service
+    if _web_search_service is None:
+        _web_search_service = WebSearchService()
+    return _web_search_service